@@ -1,18 +1,33 @@
 # pyre-unsafe
 """Tools to align a reconstruction to GPS and GCP data."""
 
+import functools
 import logging
-import math
 from collections import defaultdict
 from typing import Any, Dict, List, Optional, Tuple
 
 import cv2
 import numpy as np
 from opensfm import multiview, pygeometry, pymap, transformations as tf, types
+from opensfm.context import parallel_map
 
 
 logger: logging.Logger = logging.getLogger(__name__)
 
+# Rows of the camera rotation matrix (and their signs) giving the image
+# XYZ directions for each EXIF orientation tag.
+# See http://sylvana.net/jpegcrop/exif_orientation.html
+ORIENTATION_AXES: Dict[int, Tuple[np.ndarray, np.ndarray]] = {
+    1: (np.array([0, 1, 2]), np.array([1.0, 1.0, 1.0])),
+    2: (np.array([0, 1, 2]), np.array([-1.0, 1.0, -1.0])),
+    3: (np.array([0, 1, 2]), np.array([-1.0, -1.0, 1.0])),
+    4: (np.array([0, 1, 2]), np.array([1.0, -1.0, 1.0])),
+    5: (np.array([1, 0, 2]), np.array([1.0, 1.0, -1.0])),
+    6: (np.array([1, 0, 2]), np.array([-1.0, 1.0, 1.0])),
+    7: (np.array([1, 0, 2]), np.array([-1.0, -1.0, -1.0])),
+    8: (np.array([1, 0, 2]), np.array([1.0, -1.0, 1.0])),
+}
+
 
 def align_reconstruction(
     reconstruction: types.Reconstruction,
@@ -43,9 +58,9 @@ def apply_similarity_pose(
 ) -> None:
     """Apply a similarity (y = s A x + b) to an object having a 'pose' member."""
     R = pose.get_rotation_matrix()
-    t = np.array(pose.translation)
     Rp = R.dot(A.T)
-    tp = -Rp.dot(b) + s * t
+    tp = s * pose.translation
+    tp -= Rp.dot(b)
     pose.set_rotation_matrix(Rp)
     pose.translation = tp
 
@@ -61,16 +76,24 @@ def apply_similarity(
     :param b: The translation vector (3)
     """
     # Align points.
-    for point in reconstruction.points.values():
-        point.coordinates = s * A.dot(point.coordinates) + b
-
-    # Align rig instances
-    for rig_instance in reconstruction.rig_instances.values():
-        apply_similarity_pose(rig_instance.pose, s, A, b)
-
-    # Scale rig cameras
+    reconstruction.map.apply_similarity_to_landmarks(s, A, b)
+
+    # Align rig instances, with the products batched over all poses
+    poses = [ri.pose for ri in reconstruction.rig_instances.values()]
+    if poses:
+        Rs = np.array([pose.get_rotation_matrix() for pose in poses])
+        ts = np.array([pose.translation for pose in poses])
+        Rps = np.matmul(Rs, A.T)
+        tps = s * ts - Rps.dot(b)
+        for pose, Rp, tp in zip(poses, Rps, tps):
+            pose.set_rotation_matrix(Rp)
+            pose.translation = tp
+
+    # Scale rig cameras (identity rotation and no translation, only
+    # the translation of the pose gets scaled)
     for rig_camera in reconstruction.rig_cameras.values():
-        apply_similarity_pose(rig_camera.pose, s, np.eye(3), np.array([0, 0, 0]))
+        pose = rig_camera.pose
+        pose.translation = s * pose.translation
 
 
 def compute_reconstruction_similarity(
@@ -87,6 +110,11 @@ def compute_reconstruction_similarity(
      - navie: does a direct 3D-3D fit
      - orientation_prior: assumes a particular camera orientation
     """
+    # Triangulate GCPs once, they are used by both detection and computation
+    triangulated_gcp = None
+    if gcp and config["bundle_use_gcp"]:
+        triangulated_gcp = triangulate_all_gcp(reconstruction, gcp)
+
     align_method = config["align_method"]
     if align_method == "auto":
         align_method = detect_alignment_constraints(
@@ -94,14 +122,17 @@ def compute_reconstruction_similarity(
             reconstruction,
             gcp,
             use_gps,
+            triangulated_gcp,
         )
     res = None
     if align_method == "orientation_prior":
         res = compute_orientation_prior_similarity(
-            reconstruction, config, gcp, use_gps, use_scale
+            reconstruction, config, gcp, use_gps, use_scale, triangulated_gcp
         )
     elif align_method == "naive":
-        res = compute_naive_similarity(config, reconstruction, gcp, use_gps, use_scale)
+        res = compute_naive_similarity(
+            config, reconstruction, gcp, use_gps, use_scale, triangulated_gcp
+        )
 
     if not res:
         return None
@@ -120,30 +151,52 @@ def alignment_constraints(
     reconstruction: types.Reconstruction,
     gcp: List[pymap.GroundControlPoint],
     use_gps: bool,
-) -> Tuple[List[np.ndarray], List[np.ndarray]]:
-    """Gather alignment constraints to be used by checking bundle_use_gcp and bundle_use_gps."""
+    triangulated_gcp: Optional[Tuple[List[np.ndarray], List[np.ndarray]]] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Gather alignment constraints to be used by checking bundle_use_gcp and bundle_use_gps.
+
+    GCPs already triangulated with triangulate_all_gcp can be passed as
+    triangulated_gcp to avoid triangulating them again.
+
+    Returns the reconstructed and the measured positions as (N, 3) arrays.
+    """
 
-    X, Xp = [], []
     logger.info(f"Collecting alignment constraints - bundle_use_gps:{config['bundle_use_gps']} bundle_use_gcp: {config['bundle_use_gcp']}")
-    # Get Ground Control Point correspondences
+    triangulated, measured = [], []
     if gcp and config["bundle_use_gcp"]:
-        triangulated, measured = triangulate_all_gcp(reconstruction, gcp)
-        X.extend(triangulated)
-        Xp.extend(measured)
-    logger.info(f"GCP constraints X ({len(X)}) - Xp ({len(Xp)})")
+        if triangulated_gcp is None:
+            triangulated_gcp = triangulate_all_gcp(reconstruction, gcp)
+        triangulated, measured = triangulated_gcp
+    use_gps_constraints = use_gps and config["bundle_use_gps"]
+
+    # Allocate for the maximum number of constraints, trimmed at the end
+    max_constraints = len(triangulated)
+    if use_gps_constraints:
+        max_constraints += len(reconstruction.rig_instances)
+    X = np.empty((max_constraints, 3))
+    Xp = np.empty((max_constraints, 3))
+
+    # Get Ground Control Point correspondences
+    n = len(triangulated)
+    if n > 0:
+        X[:n] = triangulated
+        Xp[:n] = measured
+    logger.info(f"GCP constraints X ({n}) - Xp ({n})")
     # Get camera center correspondences
-    if use_gps and config["bundle_use_gps"]:
+    if use_gps_constraints:
         for rig_instance in reconstruction.rig_instances.values():
-            gpses = [
-                shot.metadata.gps_position.value
-                for shot in rig_instance.shots.values()
-                if shot.metadata.gps_position.has_value
-            ]
-            if len(gpses) > 0:
-                X.append(rig_instance.pose.get_origin())
-                Xp.append(np.average(gpses, axis=0))
-    logger.info(f"GPS constraints X ({len(X)}) - Xp ({len(Xp)})")
-    return X, Xp
+            gps_sum, gps_count = np.zeros(3), 0
+            for shot in rig_instance.shots.values():
+                gps_position = shot.metadata.gps_position
+                if gps_position.has_value:
+                    gps_sum += gps_position.value
+                    gps_count += 1
+            if gps_count > 0:
+                X[n] = rig_instance.pose.get_origin()
+                Xp[n] = gps_sum / gps_count
+                n += 1
+    logger.info(f"GPS constraints X ({n}) - Xp ({n})")
+    return X[:n], Xp[:n]
 
 
 def detect_alignment_constraints(
@@ -151,22 +204,24 @@ def detect_alignment_constraints(
     reconstruction: types.Reconstruction,
     gcp: List[pymap.GroundControlPoint],
     use_gps: bool,
+    triangulated_gcp: Optional[Tuple[List[np.ndarray], List[np.ndarray]]] = None,
 ) -> str:
     """Automatically pick the best alignment method, depending
     if alignment data such as GPS/GCP is aligned on a single-line or not.
 
     """
 
-    X, Xp = alignment_constraints(config, reconstruction, gcp, use_gps)
+    X, Xp = alignment_constraints(
+        config, reconstruction, gcp, use_gps, triangulated_gcp
+    )
     if len(X) < 3:
         return "orientation_prior"
 
-    X = np.array(X)
-    X = X - np.average(X, axis=0)
-    evalues, _ = np.linalg.eig(X.T.dot(X))
-
-    evalues = np.array(sorted(evalues))
-    ratio_1st_2nd = math.fabs(evalues[2] / evalues[1])
+    X -= X.mean(axis=0)
+    # Eigenvalues of the scatter matrix X^T X, in ascending order, computed
+    # as the squared singular values of X to avoid forming the scatter matrix
+    evalues = np.linalg.svd(X, compute_uv=False)[::-1] ** 2
+    ratio_1st_2nd = evalues[2] / evalues[1]
 
     epsilon_abs = 1e-10
     epsilon_ratio = 5e3
@@ -190,9 +245,12 @@ def compute_naive_similarity(
     gcp: List[pymap.GroundControlPoint],
     use_gps: bool,
     use_scale: bool,
+    triangulated_gcp: Optional[Tuple[List[np.ndarray], List[np.ndarray]]] = None,
 ) -> Optional[Tuple[float, np.ndarray, np.ndarray]]:
     """Compute similarity with GPS and GCP data using direct 3D-3D matches."""
-    X, Xp = alignment_constraints(config, reconstruction, gcp, use_gps)
+    X, Xp = alignment_constraints(
+        config, reconstruction, gcp, use_gps, triangulated_gcp
+    )
 
     if len(X) == 0:
         return None
@@ -209,23 +267,41 @@ def compute_naive_similarity(
             "GPS/GCP data seems to have identical values. Using translation-only alignment."
         )
     if same_values or single_value:
-        t = np.array(Xp[0]) - np.array(X[0])
+        t = Xp[0] - X[0]
         return 1.0, np.identity(3), t
 
     # Will be up to some unknown rotation
     if len(X) == 2:
         logger.warning("Only 2 constraints. Will be up to some unknown rotation.")
-        X.append(X[1])
-        Xp.append(Xp[1])
+        X = np.vstack((X, X[1]))
+        Xp = np.vstack((Xp, Xp[1]))
 
     # Compute similarity Xp = s A X + b
-    X = np.array(X)
-    Xp = np.array(Xp)
-    T = tf.superimposition_matrix(X.T, Xp.T, scale=use_scale)
+    return fit_similarity(X, Xp, use_scale)
+
+
+def fit_similarity(
+    X: np.ndarray, Xp: np.ndarray, use_scale: bool
+) -> Tuple[float, np.ndarray, np.ndarray]:
+    """Fit the similarity Xp = s A X + b between two (N, 3) point sets.
 
-    A, b = T[:3, :3], T[:3, 3]
-    s = np.linalg.det(A) ** (1.0 / 3)
-    A /= s
+    The rotation is computed from the SVD of the cross-covariance matrix
+    (Kabsch) and the scale, if used, as the ratio of the RMS deviations
+    from the centroids.
+    """
+    X_mean = X.mean(axis=0)
+    Xp_mean = Xp.mean(axis=0)
+    Xc = X - X_mean
+    Xpc = Xp - Xp_mean
+
+    U, _, Vt = np.linalg.svd(Xpc.T.dot(Xc))
+    A = U.dot(Vt)
+    if np.linalg.det(A) < 0.0:
+        # Reflection, flip the axis of least variance
+        A -= 2.0 * np.outer(U[:, 2], Vt[2])
+
+    s = np.sqrt(np.sum(Xpc**2) / np.sum(Xc**2)) if use_scale else 1.0
+    b = Xp_mean - s * A.dot(X_mean)
     return s, A, b
 
 
@@ -235,6 +311,7 @@ def compute_orientation_prior_similarity(
     gcp: List[pymap.GroundControlPoint],
     use_gps: bool,
     use_scale: bool,
+    triangulated_gcp: Optional[Tuple[List[np.ndarray], List[np.ndarray]]] = None,
 ) -> Optional[Tuple[float, np.ndarray, np.ndarray]]:
     """Compute similarity with GPS data assuming particular a camera orientation.
 
@@ -253,17 +330,18 @@ def compute_orientation_prior_similarity(
     p = estimate_ground_plane(reconstruction, config)
     if p is None:
         return None
-    Rplane = multiview.plane_horizontalling_rotation(p)
+    Rplane = _plane_horizontalling_rotation(tuple(p))
     if Rplane is None:
         return None
+    Rplane = Rplane.copy()
 
-    X, Xp = alignment_constraints(config, reconstruction, gcp, use_gps)
-    X = np.array(X)
-    Xp = np.array(Xp)
+    X, Xp = alignment_constraints(
+        config, reconstruction, gcp, use_gps, triangulated_gcp
+    )
     if len(X) < 1:
         return 1.0, Rplane, np.zeros(3)
 
-    X = Rplane.dot(X.T).T
+    X = X.dot(Rplane.T)
 
     # Estimate 2d similarity to align to GPS
     two_shots = len(X) == 2
@@ -291,7 +369,8 @@ def compute_orientation_prior_similarity(
             )
         except ValueError:
             return None
-        s = np.linalg.det(T[:2, :2]) ** 0.5
+        # T[:2, :2] is a scaled rotation, its rows have norm s
+        s = np.sqrt(np.sum(T[:2, :2] ** 2) / 2.0)
         A = np.eye(3)
         A[:2, :2] = T[:2, :2] / s
         A = A.dot(Rplane)
@@ -305,6 +384,17 @@ def compute_orientation_prior_similarity(
     return s, A, b
 
 
+@functools.lru_cache(maxsize=64)
+def _plane_horizontalling_rotation(plane: Tuple[float, ...]) -> Optional[np.ndarray]:
+    """Memoized multiview.plane_horizontalling_rotation.
+
+    The same plane can be requested repeatedly when set_gps_bias aligns
+    its per-camera sub-reconstructions. Callers must copy the returned
+    rotation before modifying it.
+    """
+    return multiview.plane_horizontalling_rotation(np.array(plane))
+
+
 def set_gps_bias(
     reconstruction: types.Reconstruction,
     config: Dict[str, Any],
@@ -334,7 +424,7 @@ def set_gps_bias(
     for s in reconstruction.shots.values():
         per_camera_shots[s.camera.id].append(s.id)
 
-    per_camera_transform = {}
+    args = []
     for camera_id, shots_id in per_camera_shots.items():
 
         # As we re-use 'compute_reconstruction_similarity', we need to construct a 'Reconstruction'
@@ -342,17 +432,21 @@ def set_gps_bias(
         subrec.add_camera(reconstruction.cameras[camera_id])
         for shot_id in shots_id:
             subrec.add_shot(reconstruction.shots[shot_id])
-        per_camera_transform[camera_id] = compute_reconstruction_similarity(
-            subrec, [], config, True, use_scale
-        )
+        args.append((camera_id, subrec, config, use_scale))
+
+    processes = config["processes"]
+    per_camera_transform = dict(
+        parallel_map(_compute_camera_similarity, args, processes)
+    )
 
     if any([True for x in per_camera_transform.values() if not x]):
         logger.warning("Cannot compensate some shots, GPS bias won't be compensated.")
     else:
         for camera_id, transform in per_camera_transform.items():
+            # The bias is the inverse of the GPS to GCP similarity
             s, A, b = transform
+            s, A, b = 1.0 / s, A.T, -A.T.dot(b) / s
             A_angle_axis = cv2.Rodrigues(A)[0].flatten()
-            s, A_angle_axis, b = 1.0 / s, -A_angle_axis, -A.T.dot(b) / s
             logger.info(
                 f"Camera {camera_id} bias : scale {s:.5f} / translation {b} / rotation {A_angle_axis}"
             )
@@ -362,6 +456,15 @@ def set_gps_bias(
     return gps_bias
 
 
+def _compute_camera_similarity(
+    args: Tuple[str, types.Reconstruction, Dict[str, Any], bool]
+) -> Tuple[str, Optional[Tuple[float, np.ndarray, np.ndarray]]]:
+    camera_id, subrec, config, use_scale = args
+    return camera_id, compute_reconstruction_similarity(
+        subrec, [], config, True, use_scale
+    )
+
+
 def estimate_ground_plane(
     reconstruction: types.Reconstruction, config: Dict[str, Any]
 ) -> Optional[np.ndarray]:
@@ -372,35 +475,30 @@ def estimate_ground_plane(
     horizontally or vertically.
     """
     orientation_type = config["align_orientation_prior"]
-    onplane, verticals, ground_points = [], [], []
+    ground_points, rotations, orientations = [], [], []
     for shot in reconstruction.shots.values():
         ground_points.append(shot.pose.get_origin())
         if not shot.metadata.orientation.has_value:
             continue
-        R = shot.pose.get_rotation_matrix()
+        rotations.append(shot.pose.get_rotation_matrix())
+        orientations.append(shot.metadata.orientation.value)
 
-        x, y, z = get_horizontal_and_vertical_directions(
-            R, shot.metadata.orientation.value
-        )
-        if orientation_type == "no_roll":
-            onplane.append(x)
-            verticals.append(-y)
-        elif orientation_type == "horizontal":
-            onplane.append(x)
-            onplane.append(z)
-            verticals.append(-y)
-        elif orientation_type == "vertical":
-            onplane.append(x)
-            onplane.append(y)
-            verticals.append(-z)
+    x, y, z = get_horizontal_and_vertical_directions_many(
+        np.array(rotations).reshape(-1, 3, 3), np.array(orientations, dtype=int)
+    )
+    onplane, verticals = np.zeros((0, 3)), np.zeros((0, 3))
+    if orientation_type == "no_roll":
+        onplane, verticals = x, -y
+    elif orientation_type == "horizontal":
+        onplane, verticals = np.vstack((x, z)), -y
+    elif orientation_type == "vertical":
+        onplane, verticals = np.vstack((x, y)), -z
 
     ground_points = np.array(ground_points)
     ground_points -= ground_points.mean(axis=0)
 
     try:
-        plane = multiview.fit_plane(
-            ground_points, np.array(onplane), np.array(verticals)
-        )
+        plane = multiview.fit_plane(ground_points, onplane, verticals)
     except ValueError:
         return None
     return plane
@@ -414,43 +512,59 @@ def get_horizontal_and_vertical_directions(
     Return a 3D vectors pointing to the positive XYZ directions of the image.
     X points to the right, Y to the bottom, Z to the front.
     """
-    # See http://sylvana.net/jpegcrop/exif_orientation.html
-    if orientation == 1:
-        return R[0, :], R[1, :], R[2, :]
-    if orientation == 2:
-        return -R[0, :], R[1, :], -R[2, :]
-    if orientation == 3:
-        return -R[0, :], -R[1, :], R[2, :]
-    if orientation == 4:
-        return R[0, :], -R[1, :], R[2, :]
-    if orientation == 5:
-        return R[1, :], R[0, :], -R[2, :]
-    if orientation == 6:
-        return -R[1, :], R[0, :], R[2, :]
-    if orientation == 7:
-        return -R[1, :], -R[0, :], -R[2, :]
-    if orientation == 8:
-        return R[1, :], -R[0, :], R[2, :]
-    logger.error("unknown orientation {0}. Using 1 instead".format(orientation))
-    return R[0, :], R[1, :], R[2, :]
+    if orientation not in ORIENTATION_AXES:
+        logger.error("unknown orientation {0}. Using 1 instead".format(orientation))
+        orientation = 1
+    rows, signs = ORIENTATION_AXES[orientation]
+    x, y, z = signs[:, np.newaxis] * R[rows]
+    return x, y, z
+
+
+def get_horizontal_and_vertical_directions_many(
+    Rs: np.ndarray, orientations: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Batched version of get_horizontal_and_vertical_directions.
+
+    Take (N, 3, 3) rotation matrices and (N,) orientation tags and
+    return the XYZ image directions as three (N, 3) arrays.
+    """
+    directions = np.empty((len(Rs), 3, 3))
+    for orientation in np.unique(orientations):
+        mask = orientations == orientation
+        if orientation not in ORIENTATION_AXES:
+            logger.error("unknown orientation {0}. Using 1 instead".format(orientation))
+            orientation = 1
+        rows, signs = ORIENTATION_AXES[orientation]
+        directions[mask] = signs[:, np.newaxis] * Rs[mask][:, rows]
+    return directions[:, 0], directions[:, 1], directions[:, 2]
 
 
 def triangulate_all_gcp(
     reconstruction: types.Reconstruction, gcp: List[pymap.GroundControlPoint]
 ) -> Tuple[List[np.ndarray], List[np.ndarray]]:
     """Group and triangulate Ground Control Points seen in 2+ images."""
-    triangulated, measured = [], []
+    triangulated, lla, has_altitude = [], [], []
     for point in gcp:
+        # GCPs without a measured position can't be used, skip triangulation
+        if not len(point.lla):
+            continue
         x = multiview.triangulate_gcp(
             point,
             reconstruction.shots,
         )
-        if x is not None and len(point.lla):
-            point_enu = np.array(
-                reconstruction.reference.to_topocentric(*point.lla_vec)
-            )
-            if not point.has_altitude:
-                point_enu[2] = x[2] = 0.0
+        if x is not None:
             triangulated.append(x)
-            measured.append(point_enu)
-    return triangulated, measured
+            lla.append(point.lla_vec)
+            has_altitude.append(point.has_altitude)
+    if not triangulated:
+        return [], []
+
+    # Convert all measured positions to topocentric coordinates at once
+    lla = np.array(lla)
+    measured = np.column_stack(
+        reconstruction.reference.to_topocentric(lla[:, 0], lla[:, 1], lla[:, 2])
+    )
+    for x, point_enu, altitude in zip(triangulated, measured, has_altitude):
+        if not altitude:
+            point_enu[2] = x[2] = 0.0
+    return triangulated, list(measured)
@@ -1,54 +1,78 @@
 # pyre-unsafe
-from . import (
-    align_submodels,
-    bundle,
-    compute_depthmaps,
-    compute_statistics,
-    create_rig,
-    create_submodels,
-    create_tracks,
-    detect_features,
-    export_bundler,
-    export_colmap,
-    export_geocoords,
-    export_openmvs,
-    export_ply,
-    export_pmvs,
-    export_report,
-    export_visualsfm,
-    extract_metadata,
-    extend_reconstruction,
-    match_features,
-    mesh,
-    reconstruct,
-    reconstruct_from_prior,
-    undistort,
-)
+import importlib
+from typing import Any, List, TYPE_CHECKING
+
 from .command_runner import command_runner
 
+if TYPE_CHECKING:
+    from . import (
+        align_submodels,
+        bundle,
+        compute_depthmaps,
+        compute_statistics,
+        create_rig,
+        create_submodels,
+        create_tracks,
+        detect_features,
+        export_bundler,
+        export_colmap,
+        export_geocoords,
+        export_openmvs,
+        export_ply,
+        export_pmvs,
+        export_report,
+        export_visualsfm,
+        extend_reconstruction,
+        extract_metadata,
+        match_features,
+        mesh,
+        reconstruct,
+        reconstruct_from_prior,
+        undistort,
+    )
+
+    opensfm_commands: List[Any]
 
-opensfm_commands = [
-    extract_metadata,
-    detect_features,
-    match_features,
-    create_rig,
-    create_tracks,
-    reconstruct,
-    reconstruct_from_prior,
-    bundle,
-    mesh,
-    undistort,
-    compute_depthmaps,
-    compute_statistics,
-    export_ply,
-    export_openmvs,
-    export_visualsfm,
-    export_pmvs,
-    export_bundler,
-    export_colmap,
-    export_geocoords,
-    export_report,
-    extend_reconstruction,
-    create_submodels,
-    align_submodels,
+
+# Command modules are imported lazily on first access, so that importing
+# a single command does not pull in the dependencies of all the others.
+_command_names: List[str] = [
+    "extract_metadata",
+    "detect_features",
+    "match_features",
+    "create_rig",
+    "create_tracks",
+    "reconstruct",
+    "reconstruct_from_prior",
+    "bundle",
+    "mesh",
+    "undistort",
+    "compute_depthmaps",
+    "compute_statistics",
+    "export_ply",
+    "export_openmvs",
+    "export_visualsfm",
+    "export_pmvs",
+    "export_bundler",
+    "export_colmap",
+    "export_geocoords",
+    "export_report",
+    "extend_reconstruction",
+    "create_submodels",
+    "align_submodels",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    # Importing a submodule binds it on the package, so this runs once per name
+    if name in _command_names:
+        return importlib.import_module(f".{name}", __name__)
+    if name == "opensfm_commands":
+        commands = [__getattr__(command_name) for command_name in _command_names]
+        globals()["opensfm_commands"] = commands
+        return commands
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> List[str]:
+    return sorted(list(globals()) + _command_names + ["opensfm_commands"])
@@ -199,6 +199,8 @@ class OpenSfMConfig:
     five_point_reversal_check: bool = False
     # Ratio of triangulated points non-reversed/reversed when checking for Necker reversal ambiguities
     five_point_reversal_ratio: float = 0.95
+    # Skip the plane-based two view reconstruction when the 5-point one has more than this ratio of inliers
+    plane_based_skip_ratio: float = 0.8
     # Outlier threshold for accepting a triangulated point in radians
     triangulation_threshold: float = 0.006
     # Minimum angle between views to accept a triangulated point
@@ -10,6 +10,39 @@ def rotation_from_angle_axis(angle_axis: np.ndarray) -> np.ndarray:
     return cv2.Rodrigues(np.asarray(angle_axis))[0]
 
 
+def angle_axis_from_rotation(rotation_matrix: np.ndarray) -> np.ndarray:
+    """Angle-axis vector of a rotation matrix.
+
+    Same result as cv2.Rodrigues, without the OpenCV round-trip.
+    """
+    R = rotation_matrix
+    r = np.array([R[2, 1] - R[1, 2], R[0, 2] - R[2, 0], R[1, 0] - R[0, 1]])
+    s = 0.5 * np.sqrt(r.dot(r))
+    c = min(max(0.5 * (R[0, 0] + R[1, 1] + R[2, 2] - 1.0), -1.0), 1.0)
+    theta = np.arctan2(s, c)
+
+    if s > 1e-5:
+        return r * (theta / (2.0 * s))
+    if c > 0:
+        # Close to identity, first order approximation
+        return 0.5 * r
+
+    # Close to a half-turn, the axis is read from the diagonal of (R + I) / 2
+    t = np.maximum(0.5 * (np.diag(R) + 1.0), 0.0)
+    axis = np.sqrt(t)
+    if R[0, 1] < 0:
+        axis[1] = -axis[1]
+    if R[0, 2] < 0:
+        axis[2] = -axis[2]
+    if (
+        abs(axis[0]) < abs(axis[1])
+        and abs(axis[0]) < abs(axis[2])
+        and (R[1, 2] > 0) != (axis[1] * axis[2] > 0)
+    ):
+        axis[2] = -axis[2]
+    return axis * (theta / np.linalg.norm(axis))
+
+
 def rotation_from_ptr(pan: float, tilt: float, roll: float) -> np.ndarray:
     """World-to-camera rotation matrix from pan, tilt and roll."""
     R1 = rotation_from_angle_axis(np.array([0.0, 0.0, roll]))
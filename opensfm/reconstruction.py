@@ -3,18 +3,21 @@
 
 import datetime
 import enum
+import functools
 import logging
 import math
+import weakref
 from abc import ABC, abstractmethod
 from collections import defaultdict
-from itertools import combinations
+from itertools import chain, combinations
+from operator import attrgetter
 from timeit import default_timer as timer
-from typing import Any, Dict, List, Optional, Set, Tuple, Union
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
 
 import cv2
 import numpy as np
 from opensfm import (
-    log,
+    geometry,
     matching,
     multiview,
     pybundle,
@@ -33,12 +36,26 @@ from opensfm.dataset_base import DataSetBase
 
 logger: logging.Logger = logging.getLogger(__name__)
 
+# Camera id of each image, per dataset, to avoid re-reading its EXIF file.
+_camera_id_cache: "weakref.WeakKeyDictionary[DataSetBase, Dict[str, str]]" = (
+    weakref.WeakKeyDictionary()
+)
+
 
 class ReconstructionAlgorithm(str, enum.Enum):
     INCREMENTAL = "incremental"
     TRIANGULATION = "triangulation"
 
 
+def _camera_id(data: DataSetBase, image: str) -> str:
+    """Camera id of an image, as found in its EXIF data."""
+    camera_ids = _camera_id_cache.setdefault(data, {})
+    camera_id = camera_ids.get(image)
+    if camera_id is None:
+        camera_id = camera_ids[image] = data.load_exif(image)["camera"]
+    return camera_id
+
+
 def _get_camera_from_bundle(
     ba: pybundle.BundleAdjuster, camera: pygeometry.Camera
 ) -> None:
@@ -166,22 +183,30 @@ def direct_shot_neighbors(
             if track.id in reconstruction.points:
                 points.add(track)
 
-    candidate_shots = set(reconstruction.shots) - set(shot_ids)
-    common_points = defaultdict(int)
-    for track in points:
-        neighbors = track.get_observations()
-        for neighbor in neighbors:
-            if neighbor.id in candidate_shots:
-                common_points[neighbor] += 1
-
-    pairs = sorted(common_points.items(), key=lambda x: -x[1])
-    neighbors = set()
-    for neighbor, num_points in pairs[:max_neighbors]:
-        if num_points >= min_common_points:
-            neighbors.add(neighbor.id)
-        else:
-            break
-    return neighbors
+    # Count common points per shot index with a single bincount, indexing
+    # only the shots that actually observe the points
+    shot_index: Dict[str, int] = {}
+    neighbors = chain.from_iterable(track.get_observations() for track in points)
+    observations = np.fromiter(
+        (
+            shot_index.setdefault(shot_id, len(shot_index))
+            for shot_id in map(attrgetter("id"), neighbors)
+        ),
+        dtype=int,
+    )
+    observed_shot_ids = list(shot_index)
+    common_points = np.bincount(observations, minlength=len(observed_shot_ids))
+    common_points[[shot_index[s] for s in shot_ids if s in shot_index]] = 0
+
+    # Only the best max_neighbors are needed, and in no particular order
+    min_common_points = max(min_common_points, 1)
+    if max_neighbors < len(common_points):
+        best = np.argpartition(-common_points, max_neighbors)[:max_neighbors]
+    else:
+        best = np.arange(len(common_points))
+    return {
+        observed_shot_ids[i] for i in best if common_points[i] >= min_common_points
+    }
 
 
 def pairwise_reconstructability(common_tracks: int, rotation_inliers: int) -> float:
@@ -206,8 +231,11 @@ def compute_image_pairs(
     cameras = data.load_camera_models()
     args = _pair_reconstructability_arguments(track_dict, cameras, data)
     processes = data.config["processes"]
-    result = parallel_map(_compute_pair_reconstructability, args, processes)
-    result = list(result)
+    # Workers are threads sharing the pair arrays, and each pair is cheap,
+    # so let joblib dispatch them in batches rather than one at a time.
+    result = parallel_map(
+        _compute_pair_reconstructability, args, processes, max_batch_size=0
+    )
     pairs = [(im1, im2) for im1, im2, r in result if r > 0]
     score = [r for im1, im2, r in result if r > 0]
     order = np.argsort(-np.array(score))
@@ -222,14 +250,13 @@ def _pair_reconstructability_arguments(
     threshold = 4 * data.config["five_point_algo_threshold"]
     args = []
     for (im1, im2), (_, p1, p2) in track_dict.items():
-        camera1 = cameras[data.load_exif(im1)["camera"]]
-        camera2 = cameras[data.load_exif(im2)["camera"]]
+        camera1 = cameras[_camera_id(data, im1)]
+        camera2 = cameras[_camera_id(data, im2)]
         args.append((im1, im2, p1, p2, camera1, camera2, threshold))
     return args
 
 
 def _compute_pair_reconstructability(args: TPairArguments) -> Tuple[str, str, float]:
-    log.setup()
     im1, im2, p1, p2, camera1, camera2, threshold = args
     R, inliers = two_view_reconstruction_rotation_only(
         p1, p2, camera1, camera2, threshold
@@ -254,7 +281,7 @@ def add_shot(
 
     added_shots = set()
     if shot_id not in rig_assignments:
-        camera_id = data.load_exif(shot_id)["camera"]
+        camera_id = _camera_id(data, shot_id)
         shot = reconstruction.create_shot(shot_id, camera_id, pose)
         shot.metadata = helpers.get_image_metadata(data, shot_id)
         added_shots = {shot_id}
@@ -264,7 +291,7 @@ def add_shot(
 
         for shot in instance_shots:
             _, rig_camera_id, _ = rig_assignments[shot]
-            camera_id = data.load_exif(shot)["camera"]
+            camera_id = _camera_id(data, shot)
             created_shot = reconstruction.create_shot(
                 shot,
                 camera_id,
@@ -315,13 +342,17 @@ def two_view_reconstruction_plane_based(
 
     motion_inliers = []
     for R, t, _, _ in motions:
-        inliers = _two_view_reconstruction_inliers(b1, b2, R.T, -R.T.dot(t), threshold)
+        Rt = R.T
+        inliers = _two_view_reconstruction_inliers(b1, b2, Rt, -Rt.dot(t), threshold)
         motion_inliers.append(inliers)
 
-    best = np.argmax(map(len, motion_inliers))
+    lengths = np.fromiter(
+        (len(x) for x in motion_inliers), dtype=int, count=len(motion_inliers)
+    )
+    best = int(np.argmax(lengths))
     R, t, n, d = motions[best]
     inliers = motion_inliers[best]
-    return cv2.Rodrigues(R)[0].ravel(), t, inliers
+    return geometry.angle_axis_from_rotation(R), t, inliers
 
 
 def two_view_reconstruction_and_refinement(
@@ -346,11 +377,10 @@ def two_view_reconstruction_and_refinement(
         rotation, translation and inlier list
     """
     if transposed:
-        t_curr = -R.T.dot(t)
         R_curr = R.T
+        t_curr = -R_curr.dot(t)
     else:
-        t_curr = t.copy()
-        R_curr = R.copy()
+        R_curr, t_curr = R, t
 
     inliers = _two_view_reconstruction_inliers(b1, b2, R_curr, t_curr, threshold)
 
@@ -362,14 +392,16 @@ def two_view_reconstruction_and_refinement(
         t_curr = T[:, 3]
         inliers = _two_view_reconstruction_inliers(b1, b2, R_curr, t_curr, threshold)
 
-    return cv2.Rodrigues(R_curr.T)[0].ravel(), -R_curr.T.dot(t_curr), inliers
+    Rt = R_curr.T
+    return geometry.angle_axis_from_rotation(Rt), -Rt.dot(t_curr), inliers
 
 
 def _two_view_rotation_inliers(
     b1: np.ndarray, b2: np.ndarray, R: np.ndarray, threshold: float
 ) -> List[int]:
-    br2 = R.dot(b2.T).T
-    ok = np.linalg.norm(br2 - b1, axis=1) < threshold
+    # For unit bearings, |R b2 - b1|^2 < threshold^2 <=> (R b2).b1 > cos_min
+    cos_min = 1.0 - 0.5 * threshold * threshold
+    ok = np.einsum("ij,ij->i", b2.dot(R.T), b1) > cos_min
     return np.nonzero(ok)[0]
 
 
@@ -396,7 +428,7 @@ def two_view_reconstruction_rotation_only(
     R = multiview.relative_pose_ransac_rotation_only(b1, b2, threshold, 1000, 0.999)
     inliers = _two_view_rotation_inliers(b1, b2, R, threshold)
 
-    return cv2.Rodrigues(R.T)[0].ravel(), inliers
+    return geometry.angle_axis_from_rotation(R.T), inliers
 
 
 def two_view_reconstruction_5pt(
@@ -481,6 +513,7 @@ def two_view_reconstruction_general(
     iterations: int,
     check_reversal: bool = False,
     reversal_ratio: float = 1.0,
+    plane_based_skip_ratio: float = 1.0,
 ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray], List[int], Dict[str, Any]]:
     """Reconstruct two views from point correspondences.
 
@@ -495,6 +528,8 @@ def two_view_reconstruction_general(
         check_reversal: whether to check for Necker reversal ambiguity
         reversal_ratio: ratio of triangulated point between normal and reversed
                         configuration to consider a pair as being ambiguous
+        plane_based_skip_ratio: ratio of 5-point inliers above which the
+                                plane-based reconstruction is not attempted
 
     Returns:
         rotation, translation and inlier list
@@ -519,12 +554,15 @@ def two_view_reconstruction_general(
     )
     valid_5pt = R_5p is not None and t_5p is not None
 
-    # Compute plane-based relative-motion
-    R_plane, t_plane, inliers_plane = two_view_reconstruction_plane_based(
-        b1,
-        b2,
-        threshold,
-    )
+    # Compute plane-based relative-motion, unless 5-point explains most matches
+    if valid_5pt and len(inliers_5p) > plane_based_skip_ratio * len(b1):
+        R_plane, t_plane, inliers_plane = None, None, []
+    else:
+        R_plane, t_plane, inliers_plane = two_view_reconstruction_plane_based(
+            b1,
+            b2,
+            threshold,
+        )
     valid_plane = R_plane is not None and t_plane is not None
 
     report: Dict[str, Any] = {
@@ -622,13 +660,14 @@ def bootstrap_reconstruction(
     }
 
     camera_priors = data.load_camera_models()
-    camera1 = camera_priors[data.load_exif(im1)["camera"]]
-    camera2 = camera_priors[data.load_exif(im2)["camera"]]
+    camera1 = camera_priors[_camera_id(data, im1)]
+    camera2 = camera_priors[_camera_id(data, im2)]
 
     threshold = data.config["five_point_algo_threshold"]
     iterations = data.config["five_point_refine_rec_iterations"]
     check_reversal = data.config["five_point_reversal_check"]
     reversal_ratio = data.config["five_point_reversal_ratio"]
+    plane_based_skip_ratio = data.config["plane_based_skip_ratio"]
 
     (
         R,
@@ -636,7 +675,15 @@ def bootstrap_reconstruction(
         inliers,
         report["two_view_reconstruction"],
     ) = two_view_reconstruction_general(
-        p1, p2, camera1, camera2, threshold, iterations, check_reversal, reversal_ratio
+        p1,
+        p2,
+        camera1,
+        camera2,
+        threshold,
+        iterations,
+        check_reversal,
+        reversal_ratio,
+        plane_based_skip_ratio,
     )
 
     if R is None or t is None:
@@ -672,41 +719,50 @@ def resect(
     data: DataSetBase,
     tracks_manager: pymap.TracksManager,
     reconstruction: types.Reconstruction,
+    rig_assignments: Dict[str, Tuple[str, str, List[str]]],
     shot_id: str,
     threshold: float,
     min_inliers: int,
+    shot_observations: Optional[Callable[[str], Dict[str, pymap.Observation]]] = None,
 ) -> Tuple[bool, Set[str], Dict[str, Any]]:
     """Try resecting and adding a shot to the reconstruction.
 
+    The observations of the shot are read with `shot_observations` if given,
+    so that callers resecting the same shots repeatedly can cache them.
+
     Return:
         True on success.
     """
+    if shot_observations is None:
+        shot_observations = tracks_manager.get_shot_observations
 
-    rig_assignments = rig.rig_assignments_per_image(data.load_rig_assignments())
-    camera = reconstruction.cameras[data.load_exif(shot_id)["camera"]]
+    camera = reconstruction.cameras[_camera_id(data, shot_id)]
 
-    bs, Xs, ids = [], [], []
-    for track, obs in tracks_manager.get_shot_observations(shot_id).items():
+    pts, ids = [], []
+    for track, obs in shot_observations(shot_id).items():
         if track in reconstruction.points:
-            b = camera.pixel_bearing(obs.point)
-            bs.append(b)
-            Xs.append(reconstruction.points[track].coordinates)
+            pts.append(obs.point)
             ids.append(track)
-    bs = np.array(bs)
-    Xs = np.array(Xs)
-    if len(bs) < 5:
-        return False, set(), {"num_common_points": len(bs)}
+    if len(ids) < 5:
+        return False, set(), {"num_common_points": len(ids)}
+    bs = camera.pixel_bearing_many(np.array(pts))
+    Xs = np.empty((len(ids), 3))
+    for i, track in enumerate(ids):
+        Xs[i] = reconstruction.points[track].coordinates
 
     T = multiview.absolute_pose_ransac(bs, Xs, threshold, 1000, 0.999)
 
     R = T[:, :3]
     t = T[:, 3]
 
-    reprojected_bs = R.T.dot((Xs - t).T).T
-    reprojected_bs /= np.linalg.norm(reprojected_bs, axis=1)[:, np.newaxis]
-
-    inliers = np.linalg.norm(reprojected_bs - bs, axis=1) < threshold
-    ninliers = int(sum(inliers))
+    # Compare the reprojected and observed bearings through their dot product,
+    # without normalizing the reprojections: |x/|x| - b|^2 < threshold^2 is
+    # x.b > |x| cos_min for a unit bearing b
+    reprojected_bs = (Xs - t).dot(R)
+    reprojected_norms = np.sqrt(np.einsum("ij,ij->i", reprojected_bs, reprojected_bs))
+    cos_min = 1.0 - 0.5 * threshold * threshold
+    inliers = np.einsum("ij,ij->i", reprojected_bs, bs) > cos_min * reprojected_norms
+    ninliers = int(np.count_nonzero(inliers))
 
     logger.info("{} resection inliers: {} / {}".format(shot_id, ninliers, len(bs)))
     report: Dict[str, Any] = {
@@ -726,11 +782,10 @@ def resect(
             triangulate_shot_features(
                 tracks_manager, reconstruction, new_shots, data.config
             )
-        for i, succeed in enumerate(inliers):
-            if succeed:
-                add_observation_to_reconstruction(
-                    tracks_manager, reconstruction, shot_id, ids[i]
-                )
+        for i in np.flatnonzero(inliers):
+            add_observation_to_reconstruction(
+                tracks_manager, reconstruction, shot_id, ids[i]
+            )
         report["shots"] = list(new_shots)
         return True, new_shots, report
     else:
@@ -760,15 +815,23 @@ def compute_common_tracks(
         reconstruction2.shots.keys()
     )
 
-    all_shot_ids1 = set(tracks_manager1.get_shot_ids())
-    all_shot_ids2 = set(tracks_manager2.get_shot_ids())
     for image in common_images:
-        if image not in all_shot_ids1 or image not in all_shot_ids2:
+        if not (
+            tracks_manager1.has_shot_observations(image)
+            and tracks_manager2.has_shot_observations(image)
+        ):
+            continue
+        # Only index the features of reconstructed tracks
+        features1 = {
+            obs.id: t1
+            for t1, obs in tracks_manager1.get_shot_observations(image).items()
+            if t1 in reconstruction1.points
+        }
+        if not features1:
             continue
-        at_shot1 = tracks_manager1.get_shot_observations(image)
-        at_shot2 = tracks_manager2.get_shot_observations(image)
-        for t1, t2 in corresponding_tracks(at_shot1, at_shot2):
-            if t1 in reconstruction1.points and t2 in reconstruction2.points:
+        for t2, obs in tracks_manager2.get_shot_observations(image).items():
+            t1 = features1.get(obs.id)
+            if t1 is not None and t2 in reconstruction2.points:
                 common_tracks.add((t1, t2))
     return list(common_tracks)
 
@@ -822,6 +885,11 @@ class TrackHandlerBase(ABC):
         """Returns the observations of 'track_id'"""
         pass
 
+    @abstractmethod
+    def get_shot_observations(self, shot_id: str) -> Dict[str, pymap.Observation]:
+        """Returns the observations of 'shot_id', indexed by track"""
+        pass
+
     @abstractmethod
     def store_track_coordinates(self, track_id: str, coordinates: np.ndarray) -> None:
         """Stores coordinates of triangulated track."""
@@ -851,11 +919,13 @@ class TrackHandlerTrackManager(TrackHandlerBase):
         """Return the observations of 'track_id', for all
         shots that appears in 'self.reconstruction.shots'
         """
-        return {
-            k: v
-            for k, v in self.tracks_manager.get_track_observations(track_id).items()
-            if k in self.reconstruction.shots
-        }
+        return self.reconstruction.map.get_valid_track_observations(
+            self.tracks_manager, track_id
+        )
+
+    def get_shot_observations(self, shot_id: str) -> Dict[str, pymap.Observation]:
+        """Return the observations of 'shot_id' in the tracks manager."""
+        return self.tracks_manager.get_shot_observations(shot_id)
 
     def store_track_coordinates(self, track_id: str, coordinates: np.ndarray) -> None:
         """Stores coordinates of triangulated track."""
@@ -867,6 +937,32 @@ class TrackHandlerTrackManager(TrackHandlerBase):
         self.reconstruction.add_observation(shot_id, track_id, observation)
 
 
+def _pairs_from_indices(indices: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Pairs (i, j) found at 'indices' in combinations(range(n), 2)."""
+    b = 2 * n - 1
+    i = ((b - np.sqrt(b * b - 8 * indices)) // 2).astype(int)
+    j = indices - i * (b - i) // 2 + i + 1
+    return i, j
+
+
+def _triangulation_inliers(
+    os: np.ndarray,
+    bs: np.ndarray,
+    X: np.ndarray,
+    threshold: float,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Indices of the rays (origins, bearings) that reproject 'X' within threshold.
+
+    An array shaped like 'os' can be given in 'out' to be used as scratch space.
+    """
+    reprojected_bs = np.subtract(X, os, out=out)
+    reprojected_bs /= np.linalg.norm(reprojected_bs, axis=1)[:, np.newaxis]
+    reprojected_bs -= bs
+    squared_errors = np.einsum("ij,ij->i", reprojected_bs, reprojected_bs)
+    return np.nonzero(squared_errors < threshold * threshold)[0]
+
+
 class TrackTriangulator:
     """Triangulate tracks in a reconstruction.
 
@@ -879,20 +975,64 @@ class TrackTriangulator:
     # for storing tracks inliers
     tracks_handler: TrackHandlerBase
 
-    # caches
-    origins: Dict[str, np.ndarray] = {}
-    rotation_inverses: Dict[str, np.ndarray] = {}
-    Rts: Dict[str, np.ndarray] = {}
-
     def __init__(
         self, reconstruction: types.Reconstruction, tracks_handler: TrackHandlerBase
     ) -> None:
         """Build a triangulator for a specific reconstruction."""
         self.reconstruction = reconstruction
         self.tracks_handler = tracks_handler
-        self.origins = {}
-        self.rotation_inverses = {}
-        self.Rts = {}
+
+        # caches, origins, rotation inverses and Rts are stored at the shot rows
+        self.shot_rows: Dict[str, int] = {}
+        self.shot_ids: List[str] = []
+        self.origins = np.empty((16, 3))
+        self.rotation_inverses = np.empty((16, 3, 3))
+        self.Rts = np.empty((16, 3, 4))
+        # world bearings of precomputed observations, grouped by track: the
+        # observations of bearing_tracks[i] are at bearing_offsets[i:i + 2]
+        self.bearing_tracks = np.empty(0, dtype=str)
+        self.bearing_offsets = np.zeros(1, dtype=np.intp)
+        self.bearing_rows = np.empty(0, dtype=np.intp)
+        self.world_bearings = np.empty((0, 3))
+        # per number of rays and threshold, list of reprojection thresholds
+        self.thresholds: Dict[Tuple[int, float], List[float]] = {}
+        # fixed seed, for RANSAC to be reproducible
+        self.rng = np.random.default_rng(42)
+
+    def compute_world_bearings(self, shot_ids: Iterable[str]) -> None:
+        """Compute at once the world bearings of all observations of some shots.
+
+        Worth doing when most tracks of these shots are to be triangulated,
+        as bearings are then looked up instead of computed track by track.
+        The shots must be all the shots of the reconstruction seeing these
+        tracks: their observations are then read from the precomputed ones.
+        """
+        tracks, rows, bearings = [self.bearing_tracks], [], []
+        for shot_id in shot_ids:
+            observations = self.tracks_handler.get_shot_observations(shot_id)
+            if not observations:
+                continue
+            shot = self.reconstruction.shots[shot_id]
+            row = self._shot_row(shot)
+            points = np.array([obs.point for obs in observations.values()])
+            bs = shot.camera.pixel_bearing_many(points)
+            tracks.append(np.array(list(observations)))
+            rows.append(np.full(len(points), row, dtype=np.intp))
+            bearings.append(bs.dot(self.rotation_inverses[row].T))
+        if not rows:
+            return
+
+        # Expand the tracks already precomputed to one entry per observation
+        counts = np.diff(self.bearing_offsets)
+        tracks[0] = np.repeat(self.bearing_tracks, counts)
+        all_tracks = np.concatenate(tracks)
+        all_rows = np.concatenate([self.bearing_rows] + rows)
+        order = np.lexsort((all_rows, all_tracks))
+        all_tracks = all_tracks[order]
+        self.bearing_rows = all_rows[order]
+        self.world_bearings = np.concatenate([self.world_bearings] + bearings)[order]
+        self.bearing_tracks, starts = np.unique(all_tracks, return_index=True)
+        self.bearing_offsets = np.append(starts, len(all_tracks))
 
     def triangulate_robust(
         self,
@@ -902,40 +1042,51 @@ class TrackTriangulator:
         iterations: int,
     ) -> None:
         """Triangulate track in a RANSAC way and add point to reconstruction."""
-        os, bs, ids = [], [], []
-        for shot_id, obs in self.tracks_handler.get_observations(track).items():
-            shot = self.reconstruction.shots[shot_id]
-            os.append(self._shot_origin(shot))
-            b = shot.camera.pixel_bearing(np.array(obs.point))
-            r = self._shot_rotation_inverse(shot)
-            bs.append(r.dot(b))
-            ids.append(shot_id)
-
+        ids, rows, bs = self._track_world_bearings(track)
         if len(ids) < 2:
             return
 
-        os = np.array(os)
-        bs = np.array(bs)
+        os = self.origins[rows]
+        min_ray_angle_radians = math.radians(min_ray_angle_degrees)
+        max_ray_angle_radians = np.pi - min_ray_angle_radians
+
+        # A single pair of rays, nothing to sample
+        if len(ids) == 2:
+            valid_triangulation, X = pygeometry.triangulate_bearings_midpoint(
+                os,
+                bs,
+                self._thresholds(2, reproj_threshold),
+                min_ray_angle_radians,
+                max_ray_angle_radians,
+            )
+            if not valid_triangulation:
+                return
+            X = pygeometry.point_refinement(os, bs, X, iterations)
+            inliers = _triangulation_inliers(os, bs, X, reproj_threshold)
+            if len(inliers) == 2:
+                self.tracks_handler.store_track_coordinates(track, X.tolist())
+                for i in inliers:
+                    self.tracks_handler.store_inliers_observation(track, ids[i])
+            return
 
         best_inliers = []
         best_point = None
-        combinatiom_tried = set()
         ransac_tries = 11  # 0.99 proba, 60% inliers
-        all_combinations = list(combinations(range(len(ids)), 2))
-
-        thresholds = len(os) * [reproj_threshold]
-        min_ray_angle_radians = np.radians(min_ray_angle_degrees)
-        max_ray_angle_radians = np.pi - min_ray_angle_radians
-        for i in range(ransac_tries):
-            random_id = int(np.random.rand() * (len(all_combinations) - 1))
-            if random_id in combinatiom_tried:
-                continue
+        log_failure_proba = math.log(1.0 - 0.99)
 
-            i, j = all_combinations[random_id]
-            combinatiom_tried.add(random_id)
+        # Try all pairs of rays if there are few, distinct random ones otherwise
+        n_pairs = len(ids) * (len(ids) - 1) // 2
+        if n_pairs <= ransac_tries:
+            pair_indices = np.arange(n_pairs)
+        else:
+            pair_indices = self.rng.choice(n_pairs, ransac_tries, replace=False)
+        pairs = zip(*_pairs_from_indices(pair_indices, len(ids)))
 
-            os_t = np.array([os[i], os[j]])
-            bs_t = np.array([bs[i], bs[j]])
+        thresholds = self._thresholds(2, reproj_threshold)
+        scratch = np.empty_like(os)
+        for n_try, (i, j) in enumerate(pairs):
+            os_t = os[[i, j]]
+            bs_t = bs[[i, j]]
 
             valid_triangulation, X = pygeometry.triangulate_bearings_midpoint(
                 os_t,
@@ -947,31 +1098,27 @@ class TrackTriangulator:
             X = pygeometry.point_refinement(os_t, bs_t, X, iterations)
 
             if valid_triangulation:
-                reprojected_bs = X - os
-                reprojected_bs /= np.linalg.norm(reprojected_bs, axis=1)[:, np.newaxis]
-                inliers = np.nonzero(
-                    np.linalg.norm(reprojected_bs - bs, axis=1) < reproj_threshold
-                )[0].tolist()
+                inliers = _triangulation_inliers(
+                    os, bs, X, reproj_threshold, scratch
+                )
 
                 if len(inliers) > len(best_inliers):
+                    os_inliers = os[inliers]
+                    bs_inliers = bs[inliers]
                     _, new_X = pygeometry.triangulate_bearings_midpoint(
-                        os[inliers],
-                        bs[inliers],
-                        len(inliers) * [reproj_threshold],
+                        os_inliers,
+                        bs_inliers,
+                        self._thresholds(len(inliers), reproj_threshold),
                         min_ray_angle_radians,
                         max_ray_angle_radians,
                     )
                     new_X = pygeometry.point_refinement(
-                        os[inliers], bs[inliers], X, iterations
+                        os_inliers, bs_inliers, new_X, iterations
                     )
 
-                    reprojected_bs = new_X - os
-                    reprojected_bs /= np.linalg.norm(reprojected_bs, axis=1)[
-                        :, np.newaxis
-                    ]
-                    ls_inliers = np.nonzero(
-                        np.linalg.norm(reprojected_bs - bs, axis=1) < reproj_threshold
-                    )[0]
+                    ls_inliers = _triangulation_inliers(
+                        os, bs, new_X, reproj_threshold, scratch
+                    )
                     if len(ls_inliers) > len(inliers):
                         best_inliers = ls_inliers
                         best_point = new_X.tolist()
@@ -979,14 +1126,13 @@ class TrackTriangulator:
                         best_inliers = inliers
                         best_point = X.tolist()
 
-                    pout = 0.99
                     inliers_ratio = float(len(best_inliers)) / len(ids)
                     if inliers_ratio == 1.0:
                         break
-                    optimal_iter = math.log(1.0 - pout) / math.log(
+                    optimal_iter = log_failure_proba / math.log(
                         1.0 - inliers_ratio * inliers_ratio
                     )
-                    if optimal_iter <= i:
+                    if optimal_iter <= n_try:
                         break
 
         if len(best_inliers) > 1:
@@ -1002,29 +1148,21 @@ class TrackTriangulator:
         iterations: int,
     ) -> None:
         """Triangulate track and add point to reconstruction."""
-        os, bs, ids = [], [], []
-        for shot_id, obs in self.tracks_handler.get_observations(track).items():
-            shot = self.reconstruction.shots[shot_id]
-            os.append(self._shot_origin(shot))
-            b = shot.camera.pixel_bearing(np.array(obs.point))
-            r = self._shot_rotation_inverse(shot)
-            bs.append(r.dot(b))
-            ids.append(shot_id)
+        ids, rows, bs = self._track_world_bearings(track)
 
-        if len(os) >= 2:
-            thresholds = len(os) * [reproj_threshold]
-            min_ray_angle_radians = np.radians(min_ray_angle_degrees)
+        if len(ids) >= 2:
+            os = self.origins[rows]
+            thresholds = self._thresholds(len(os), reproj_threshold)
+            min_ray_angle_radians = math.radians(min_ray_angle_degrees)
             valid_triangulation, X = pygeometry.triangulate_bearings_midpoint(
-                np.asarray(os),
-                np.asarray(bs),
+                os,
+                bs,
                 thresholds,
                 min_ray_angle_radians,
                 np.pi - min_ray_angle_radians,
             )
             if valid_triangulation:
-                X = pygeometry.point_refinement(
-                    np.array(os), np.array(bs), X, iterations
-                )
+                X = pygeometry.point_refinement(os, bs, X, iterations)
                 self.tracks_handler.store_track_coordinates(track, X.tolist())
                 for shot_id in ids:
                     self.tracks_handler.store_inliers_observation(track, shot_id)
@@ -1037,53 +1175,99 @@ class TrackTriangulator:
         iterations: int,
     ) -> None:
         """Triangulate track using DLT and add point to reconstruction."""
-        Rts, bs, os, ids = [], [], [], []
-        for shot_id, obs in self.tracks_handler.get_observations(track).items():
-            shot = self.reconstruction.shots[shot_id]
-            os.append(self._shot_origin(shot))
-            Rts.append(self._shot_Rt(shot))
-            b = shot.camera.pixel_bearing(np.array(obs.point))
-            bs.append(b)
-            ids.append(shot_id)
+        observations = self.tracks_handler.get_observations(track)
+        ids, shots, bs = self._track_bearings(observations)
 
-        if len(Rts) >= 2:
+        if len(ids) >= 2:
+            rows = self._shot_rows(shots)
             e, X = pygeometry.triangulate_bearings_dlt(
-                np.asarray(Rts),
-                np.asarray(bs),
+                self.Rts[rows],
+                bs,
                 reproj_threshold,
-                np.radians(min_ray_angle_degrees),
+                math.radians(min_ray_angle_degrees),
             )
             if e:
-                X = pygeometry.point_refinement(
-                    np.array(os), np.array(bs), X, iterations
-                )
+                os = self.origins[rows]
+                X = pygeometry.point_refinement(os, bs, X, iterations)
                 self.tracks_handler.store_track_coordinates(track, X.tolist())
                 for shot_id in ids:
                     self.tracks_handler.store_inliers_observation(track, shot_id)
 
-    def _shot_origin(self, shot: pymap.Shot) -> np.ndarray:
-        if shot.id in self.origins:
-            return self.origins[shot.id]
-        else:
-            o = shot.pose.get_origin()
-            self.origins[shot.id] = o
-            return o
+    def _track_bearings(
+        self, observations: Dict[str, pymap.Observation]
+    ) -> Tuple[List[str], List[pymap.Shot], np.ndarray]:
+        """Shot ids, shots and camera bearings of the observations of a track.
 
-    def _shot_rotation_inverse(self, shot: pymap.Shot) -> np.ndarray:
-        if shot.id in self.rotation_inverses:
-            return self.rotation_inverses[shot.id]
-        else:
-            r = shot.pose.get_rotation_matrix().T
-            self.rotation_inverses[shot.id] = r
-            return r
+        Bearings are computed with one call per camera of the track.
+        """
+        ids, shots, points = [], [], []
+        for shot_id, obs in observations.items():
+            ids.append(shot_id)
+            shots.append(self.reconstruction.shots[shot_id])
+            points.append(obs.point)
+
+        bs = np.empty((len(ids), 3))
+        if not ids:
+            return ids, shots, bs
+
+        per_camera = defaultdict(list)
+        for i, shot in enumerate(shots):
+            per_camera[shot.camera.id].append(i)
+        points = np.array(points)
+        for indices in per_camera.values():
+            camera = shots[indices[0]].camera
+            bs[indices] = camera.pixel_bearing_many(points[indices])
+        return ids, shots, bs
+
+    def _track_world_bearings(
+        self, track: str
+    ) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """Shot ids, shot rows and world bearings of the observations of a track."""
+        i = np.searchsorted(self.bearing_tracks, track)
+        if i < len(self.bearing_tracks) and self.bearing_tracks[i] == track:
+            begin, end = self.bearing_offsets[i : i + 2]
+            rows = self.bearing_rows[begin:end]
+            ids = [self.shot_ids[row] for row in rows]
+            return ids, rows, self.world_bearings[begin:end]
+
+        observations = self.tracks_handler.get_observations(track)
+        ids, shots, bs = self._track_bearings(observations)
+        rows = self._shot_rows(shots)
+        bs = np.einsum("nij,nj->ni", self.rotation_inverses[rows], bs)
+        return ids, rows, bs
+
+    def _shot_rows(self, shots: List[pymap.Shot]) -> np.ndarray:
+        """Rows of the shots in the origins and rotation inverses caches."""
+        return np.fromiter(
+            (self._shot_row(shot) for shot in shots), dtype=np.intp, count=len(shots)
+        )
 
-    def _shot_Rt(self, shot: pymap.Shot) -> np.ndarray:
-        if shot.id in self.Rts:
-            return self.Rts[shot.id]
-        else:
-            r = shot.pose.get_Rt()
-            self.Rts[shot.id] = r
-            return r
+    def _shot_row(self, shot: pymap.Shot) -> int:
+        row = self.shot_rows.get(shot.id)
+        if row is not None:
+            return row
+
+        row = len(self.shot_rows)
+        if row == len(self.origins):
+            self.origins = np.resize(self.origins, (2 * row, 3))
+            self.rotation_inverses = np.resize(self.rotation_inverses, (2 * row, 3, 3))
+            self.Rts = np.resize(self.Rts, (2 * row, 3, 4))
+        pose = shot.pose
+        Rt = pose.get_Rt()
+        self.origins[row] = pose.get_origin()
+        self.rotation_inverses[row] = Rt[:, :3].T
+        self.Rts[row] = Rt
+        self.shot_rows[shot.id] = row
+        self.shot_ids.append(shot.id)
+        return row
+
+    def _thresholds(self, n: int, reproj_threshold: float) -> List[float]:
+        """Reprojection thresholds of n rays, shared between calls."""
+        key = (n, reproj_threshold)
+        thresholds = self.thresholds.get(key)
+        if thresholds is None:
+            thresholds = self.thresholds[key] = n * [reproj_threshold]
+        return thresholds
 
 
 def triangulate_shot_features(
@@ -1141,19 +1325,20 @@ def retriangulate(
     triangulator = TrackTriangulator(
         reconstruction, TrackHandlerTrackManager(tracks_manager, reconstruction)
     )
-    tracks = set()
-    for image in reconstruction.shots.keys():
-        if image in all_shots_ids:
-            tracks.update(tracks_manager.get_shot_observations(image).keys())
-    for track in tracks:
-        if config["triangulation_type"] == "ROBUST":
-            triangulator.triangulate_robust(
-                track, threshold, min_ray_angle, refinement_iterations
-            )
-        elif config["triangulation_type"] == "FULL":
-            triangulator.triangulate(
-                track, threshold, min_ray_angle, refinement_iterations
-            )
+    if config["triangulation_type"] == "ROBUST":
+        triangulate = triangulator.triangulate_robust
+    elif config["triangulation_type"] == "FULL":
+        triangulate = triangulator.triangulate
+    else:
+        triangulate = None
+
+    if triangulate is not None:
+        # All tracks of the shots are retriangulated: compute their bearings at once
+        triangulator.compute_world_bearings(
+            image for image in reconstruction.shots.keys() if image in all_shots_ids
+        )
+        for track in triangulator.bearing_tracks.tolist():
+            triangulate(track, threshold, min_ray_angle, refinement_iterations)
 
     report["num_points_after"] = len(reconstruction.points)
     chrono.lap("retriangulate")
@@ -1164,10 +1349,12 @@ def retriangulate(
 def get_error_distribution(points: Dict[str, pymap.Landmark]) -> Tuple[float, float]:
     all_errors = []
     for track in points.values():
-        all_errors += track.reprojection_errors.values()
+        all_errors.extend(track.reprojection_errors.values())
+    all_errors = np.array(all_errors).reshape(-1, 2)
     robust_mean = np.median(all_errors, axis=0)
+    all_errors -= robust_mean
     robust_std = 1.486 * np.median(
-        np.linalg.norm(np.array(all_errors) - robust_mean, axis=1)
+        np.sqrt(np.einsum("ij,ij->i", all_errors, all_errors))
     )
     return robust_mean, robust_std
 
@@ -1197,14 +1384,19 @@ def remove_outliers(
     if points is None:
         points = reconstruction.points
     threshold_sqr = get_actual_threshold(config, reconstruction.points) ** 2
-    outliers = []
+
+    # Flatten the errors of all observations to check them at once
+    point_ids, shot_ids, errors = [], [], []
     for point_id in points:
-        for shot_id, error in reconstruction.points[
-            point_id
-        ].reprojection_errors.items():
-            error_sqr = error[0] ** 2 + error[1] ** 2
-            if error_sqr > threshold_sqr:
-                outliers.append((point_id, shot_id))
+        point_errors = reconstruction.points[point_id].reprojection_errors
+        point_ids.extend([point_id] * len(point_errors))
+        shot_ids.extend(point_errors.keys())
+        errors.extend(point_errors.values())
+    errors = np.array(errors).reshape(-1, 2)
+    errors_sqr = np.einsum("ij,ij->i", errors, errors)
+    outliers = [
+        (point_ids[i], shot_ids[i]) for i in np.flatnonzero(errors_sqr > threshold_sqr)
+    ]
 
     track_ids = set()
     for track, shot_id in outliers:
@@ -1286,32 +1478,51 @@ def merge_reconstructions(
     reconstructions: List[types.Reconstruction], config: Dict[str, Any]
 ) -> List[types.Reconstruction]:
     """Greedily merge reconstructions with common tracks."""
-    num_reconstruction = len(reconstructions)
-    ids_reconstructions = np.arange(num_reconstruction)
-    remaining_reconstruction = ids_reconstructions
+    # merge_two_reconstructions needs at least 10 common inliers
+    min_common = 10
+
+    reconstructions_per_track = defaultdict(list)
+    for i, reconstruction in enumerate(reconstructions):
+        for track in reconstruction.points:
+            reconstructions_per_track[track].append(i)
+    num_common = defaultdict(int)
+    for ids in reconstructions_per_track.values():
+        for i, j in combinations(ids, 2):
+            num_common[i, j] += 1
+
+    def group_common(group: List[int], k: int) -> int:
+        return sum(num_common.get((min(g, k), max(g, k)), 0) for g in group)
+
+    remaining_reconstruction = set(range(len(reconstructions)))
     reconstructions_merged = []
     num_merge = 0
 
-    for (i, j) in combinations(ids_reconstructions, 2):
-        if (i in remaining_reconstruction) and (j in remaining_reconstruction):
-            r = merge_two_reconstructions(
-                reconstructions[i], reconstructions[j], config
-            )
-            if len(r) == 1:
-                remaining_reconstruction = list(set(remaining_reconstruction) - {i, j})
-                for k in remaining_reconstruction:
-                    rr = merge_two_reconstructions(r[0], reconstructions[k], config)
-                    if len(r) == 2:
-                        break
-                    else:
-                        r = rr
-                        remaining_reconstruction = list(
-                            set(remaining_reconstruction) - {k}
-                        )
-                reconstructions_merged.append(r[0])
-                num_merge += 1
-
-    for k in remaining_reconstruction:
+    # Start from the pairs with the most tracks in common
+    pairs = sorted(
+        (pair for pair, n in num_common.items() if n >= min_common),
+        key=lambda pair: -num_common[pair],
+    )
+    for i, j in pairs:
+        if i not in remaining_reconstruction or j not in remaining_reconstruction:
+            continue
+        r = merge_two_reconstructions(reconstructions[i], reconstructions[j], config)
+        if len(r) != 1:
+            continue
+
+        remaining_reconstruction -= {i, j}
+        group = [i, j]
+        for k in sorted(remaining_reconstruction):
+            if group_common(group, k) < min_common:
+                continue
+            rr = merge_two_reconstructions(r[0], reconstructions[k], config)
+            if len(rr) == 1:
+                r = rr
+                remaining_reconstruction.remove(k)
+                group.append(k)
+        reconstructions_merged.append(r[0])
+        num_merge += 1
+
+    for k in sorted(remaining_reconstruction):
         reconstructions_merged.append(reconstructions[k])
 
     logger.info("Merged {0} reconstructions".format(num_merge))
@@ -1396,8 +1607,14 @@ def grow_reconstruction(
 
     camera_priors = data.load_camera_models()
     rig_camera_priors = data.load_rig_cameras()
+    rig_assignments = rig.rig_assignments_per_image(data.load_rig_assignments())
+
+    # Candidates failing resection are retried after each new shot, while the
+    # tracks manager does not change: keep their observations at hand.
+    shot_observations = functools.lru_cache(maxsize=128)(
+        tracks_manager.get_shot_observations
+    )
 
-    paint_reconstruction(data, tracks_manager, reconstruction)
     align_reconstruction(reconstruction, gcp, config)
 
     bundle(reconstruction, camera_priors, rig_camera_priors, None, config)
@@ -1430,9 +1647,11 @@ def grow_reconstruction(
                 data,
                 tracks_manager,
                 reconstruction,
+                rig_assignments,
                 image,
                 threshold,
                 min_inliers,
+                shot_observations,
             )
             if not ok:
                 continue
@@ -1660,8 +1879,10 @@ def reconstruct_from_prior(
     rec_report["num_prior_images"] = len(prior_images)
     rec_report["num_remaining_images"] = len(remaining_images)
 
-    # Start with the known poses
-    triangulate_shot_features(tracks_manager, reconstruction, prior_images, data.config)
+    # Start with the known poses, triangulating all tracks of the prior shots
+    rec_report["triangulation"] = retriangulate(
+        tracks_manager, reconstruction, data.config
+    )
     paint_reconstruction(data, tracks_manager, reconstruction)
     report["not_reconstructed_images"] = list(remaining_images)
     return report, reconstruction
@@ -1673,19 +1894,17 @@ class Chronometer:
 
     def start(self) -> None:
         t = timer()
-        lap = ("start", 0, t)
-        self.laps = [lap]
-        self.laps_dict = {"start": lap}
+        self.laps = [("start", 0, t)]
+        self.lap_indices = {"start": 0}
 
     def lap(self, key: str) -> None:
         t = timer()
         dt = t - self.laps[-1][2]
-        lap = (key, dt, t)
-        self.laps.append(lap)
-        self.laps_dict[key] = lap
+        self.lap_indices[key] = len(self.laps)
+        self.laps.append((key, dt, t))
 
     def lap_time(self, key: str) -> float:
-        return self.laps_dict[key][1]
+        return self.laps[self.lap_indices[key]][1]
 
     def lap_times(self) -> List[Tuple[str, float]]:
         return [(k, dt) for k, dt, t in self.laps[1:]]
@@ -128,6 +128,10 @@ class Map {
 
   // Creation
   Landmark& CreateLandmark(const LandmarkId& lm_id, const Vec3d& global_pos);
+  void CreateLandmarks(const std::vector<LandmarkId>& lm_ids,
+                       const MatX3d& global_positions);
+  void CreateLandmarks(const std::vector<LandmarkId>& lm_ids,
+                       const MatX3d& global_positions, const MatX3i& colors);
 
   // Getters
   const Landmark& GetLandmark(const LandmarkId& lm_id) const;
@@ -146,12 +150,18 @@ class Map {
   // Update
   void RemoveLandmark(const Landmark* const lm);
   void RemoveLandmark(const LandmarkId& lm_id);
+  void ApplySimilarityToLandmarks(const double scale, const Mat3d& rotation,
+                                  const Vec3d& translation);
 
   // Observation
   void AddObservation(Shot* const shot, Landmark* const lm,
                       const Observation& obs);
   void AddObservation(const ShotId& shot_id, const LandmarkId& lm_id,
                       const Observation& obs);
+  void AddShotObservations(const ShotId& shot_id,
+                           const std::vector<LandmarkId>& lm_ids,
+                           const MatX3d& xys_scales, const MatX3i& colors,
+                           const VecXi& feature_ids);
   void RemoveObservation(const ShotId& shot_id, const LandmarkId& lm_id);
   void ClearObservationsAndLandmarks();
   void CleanLandmarksBelowMinObservations(const size_t min_observations);
@@ -197,6 +207,8 @@ class Map {
                             const ErrorType& error_type) const;
   std::unordered_map<ShotId, std::unordered_map<LandmarkId, Observation> >
   GetValidObservations(const TracksManager& tracks_manager) const;
+  std::unordered_map<ShotId, Observation> GetValidTrackObservations(
+      const TracksManager& tracks_manager, const TrackId& track_id) const;
 
  private:
   void UpdateShotWithRig(const Shot& other_shot, bool is_panoshot = false);
@@ -160,11 +160,17 @@ class Map:
     def add_observation(self, shot: Shot, landmark: Landmark, observation: Observation) -> None: ...
     @overload
     def add_observation(self, shot_Id: str, landmark_id: str, observation: Observation) -> None: ...
+    def add_shot_observations(self, shot_id: str, landmark_ids: List[str], xys_scales: numpy.ndarray, colors: numpy.ndarray, feature_ids: numpy.ndarray) -> None: ...
+    def apply_similarity_to_landmarks(self, scale: float, rotation: numpy.ndarray, translation: numpy.ndarray) -> None: ...
     def clean_landmarks_below_min_observations(self, arg0: int) -> None: ...
     def clear_observations_and_landmarks(self) -> None: ...
     def compute_reprojection_errors(self, arg0: TracksManager, arg1: ErrorType) -> Dict[str, Dict[str, numpy.ndarray]]: ...
     def create_camera(self, camera: opensfm.pygeometry.Camera) -> opensfm.pygeometry.Camera: ...
     def create_landmark(self, lm_id: str, global_position: numpy.ndarray) -> Landmark: ...
+    @overload
+    def create_landmarks(self, lm_ids: List[str], global_positions: numpy.ndarray) -> None: ...
+    @overload
+    def create_landmarks(self, lm_ids: List[str], global_positions: numpy.ndarray, colors: numpy.ndarray) -> None: ...
     def create_pano_shot(self, arg0: str, arg1: str, arg2: str, arg3: str, arg4: opensfm.pygeometry.Pose) -> Shot: ...
     def create_rig_camera(self, arg0: RigCamera) -> RigCamera: ...
     def create_rig_instance(self, arg0: str) -> RigInstance: ...
@@ -188,6 +194,7 @@ class Map:
     def get_shot(self, arg0: str) -> Shot: ...
     def get_shots(self) -> ShotView: ...
     def get_valid_observations(self, arg0: TracksManager) -> Dict[str, Dict[str, Observation]]: ...
+    def get_valid_track_observations(self, arg0: TracksManager, arg1: str) -> Dict[str, Observation]: ...
     def has_landmark(self, arg0: str) -> bool: ...
     @overload
     def remove_landmark(self, arg0: Landmark) -> None: ...
@@ -463,6 +470,7 @@ class ShotView:
 class TracksManager:
     def __init__(self) -> None: ...
     def add_observation(self, arg0: str, arg1: str, arg2: Observation) -> None: ...
+    def add_shot_observations(self, arg0: str, arg1: List[str], arg2: numpy.ndarray, arg3: numpy.ndarray, arg4: numpy.ndarray) -> None: ...
     def as_string(self) -> str: ...
     def construct_sub_tracks_manager(self, arg0: List[str], arg1: List[str]) -> TracksManager: ...
     def get_all_common_observations(self, arg0: str, arg1: str) -> List[Tuple[str, Observation, Observation]]: ...
@@ -472,6 +480,7 @@ class TracksManager:
     def get_shot_observations(self, arg0: str) -> Dict[str, Observation]: ...
     def get_track_ids(self) -> List[str]: ...
     def get_track_observations(self, arg0: str) -> Dict[str, Observation]: ...
+    def has_shot_observations(self, arg0: str) -> bool: ...
     @staticmethod
     def instanciate_from_file(arg0: str) -> TracksManager: ...
     @staticmethod
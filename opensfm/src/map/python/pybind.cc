@@ -280,10 +280,13 @@ PYBIND11_MODULE(pymap, m) {
       .def_static("merge_tracks_manager",
                   &map::TracksManager::MergeTracksManager)
       .def("add_observation", &map::TracksManager::AddObservation)
+      .def("add_shot_observations", &map::TracksManager::AddShotObservations)
       .def("remove_observation", &map::TracksManager::RemoveObservation)
       .def("num_shots", &map::TracksManager::NumShots)
       .def("num_tracks", &map::TracksManager::NumTracks)
       .def("get_shot_ids", &map::TracksManager::GetShotIds)
+      .def("has_shot_observations",
+           &map::TracksManager::HasShotObservations)
       .def("get_track_ids", &map::TracksManager::GetTrackIds)
       .def("get_observation", &map::TracksManager::GetObservation)
       .def("get_shot_observations", &map::TracksManager::GetShotObservations)
@@ -595,6 +598,15 @@ PYBIND11_MODULE(pymap, m) {
       .def("create_landmark", &map::Map::CreateLandmark, py::arg("lm_id"),
            py::arg("global_position"),
            py::return_value_policy::reference_internal)
+      .def("create_landmarks",
+           py::overload_cast<const std::vector<map::LandmarkId> &,
+                             const MatX3d &>(&map::Map::CreateLandmarks),
+           py::arg("lm_ids"), py::arg("global_positions"))
+      .def("create_landmarks",
+           py::overload_cast<const std::vector<map::LandmarkId> &,
+                             const MatX3d &, const MatX3i &>(
+               &map::Map::CreateLandmarks),
+           py::arg("lm_ids"), py::arg("global_positions"), py::arg("colors"))
       .def("remove_landmark", (void (map::Map::*)(const map::Landmark *const)) &
                                   map::Map::RemoveLandmark)
       .def("remove_landmark", (void (map::Map::*)(const map::LandmarkId &)) &
@@ -607,6 +619,9 @@ PYBIND11_MODULE(pymap, m) {
            &map::Map::ClearObservationsAndLandmarks)
       .def("clean_landmarks_below_min_observations",
            &map::Map::CleanLandmarksBelowMinObservations)
+      .def("apply_similarity_to_landmarks",
+           &map::Map::ApplySimilarityToLandmarks, py::arg("scale"),
+           py::arg("rotation"), py::arg("translation"))
       // Shot
       .def(
           "create_shot",
@@ -646,6 +661,9 @@ PYBIND11_MODULE(pymap, m) {
                                const map::Observation &)) &
                map::Map::AddObservation,
            py::arg("shot_Id"), py::arg("landmark_id"), py::arg("observation"))
+      .def("add_shot_observations", &map::Map::AddShotObservations,
+           py::arg("shot_id"), py::arg("landmark_ids"), py::arg("xys_scales"),
+           py::arg("colors"), py::arg("feature_ids"))
       .def("remove_observation",
            (void (map::Map::*)(const map::ShotId &, const map::LandmarkId &)) &
                map::Map::RemoveObservation,
@@ -668,5 +686,7 @@ PYBIND11_MODULE(pymap, m) {
       // Tracks manager x Reconstruction intersection
       .def("compute_reprojection_errors", &map::Map::ComputeReprojectionErrors)
       .def("get_valid_observations", &map::Map::GetValidObservations)
+      .def("get_valid_track_observations",
+           &map::Map::GetValidTrackObservations)
       .def("to_tracks_manager", &map::Map::ToTracksManager);
 }
@@ -77,6 +77,25 @@ void Map::AddObservation(const ShotId& shot_id, const LandmarkId& lm_id,
   AddObservation(&shot, &lm, obs);
 }
 
+void Map::AddShotObservations(const ShotId& shot_id,
+                              const std::vector<LandmarkId>& lm_ids,
+                              const MatX3d& xys_scales, const MatX3i& colors,
+                              const VecXi& feature_ids) {
+  const auto count = static_cast<Eigen::Index>(lm_ids.size());
+  if (xys_scales.rows() != count || colors.rows() != count ||
+      feature_ids.size() != count) {
+    throw std::runtime_error(
+        "Landmark ids, points, colors and feature ids have different sizes.");
+  }
+  auto& shot = GetShot(shot_id);
+  for (Eigen::Index i = 0; i < count; ++i) {
+    const Observation obs(xys_scales(i, 0), xys_scales(i, 1), xys_scales(i, 2),
+                          colors(i, 0), colors(i, 1), colors(i, 2),
+                          feature_ids[i]);
+    AddObservation(&shot, &GetLandmark(lm_ids[i]), obs);
+  }
+}
+
 void Map::RemoveObservation(const ShotId& shot_id, const LandmarkId& lm_id) {
   auto& shot = GetShot(shot_id);
   auto& lm = GetLandmark(lm_id);
@@ -290,6 +309,39 @@ Landmark& Map::CreateLandmark(const LandmarkId& lm_id,
   }
 }
 
+/**
+ * Creates several landmarks at once
+ *
+ * @param lm_ids            unique ids of the landmarks
+ * @param global_positions  3D positions of the landmarks, one per row
+ * @param colors            colors of the landmarks, one per row
+ */
+void Map::CreateLandmarks(const std::vector<LandmarkId>& lm_ids,
+                          const MatX3d& global_positions) {
+  const auto count = static_cast<Eigen::Index>(lm_ids.size());
+  if (global_positions.rows() != count) {
+    throw std::runtime_error(
+        "Landmark ids and positions have different sizes.");
+  }
+  for (Eigen::Index i = 0; i < count; ++i) {
+    CreateLandmark(lm_ids[i], global_positions.row(i).transpose());
+  }
+}
+
+void Map::CreateLandmarks(const std::vector<LandmarkId>& lm_ids,
+                          const MatX3d& global_positions,
+                          const MatX3i& colors) {
+  const auto count = static_cast<Eigen::Index>(lm_ids.size());
+  if (global_positions.rows() != count || colors.rows() != count) {
+    throw std::runtime_error(
+        "Landmark ids, positions and colors have different sizes.");
+  }
+  for (Eigen::Index i = 0; i < count; ++i) {
+    auto& lm = CreateLandmark(lm_ids[i], global_positions.row(i).transpose());
+    lm.SetColor(colors.row(i).transpose());
+  }
+}
+
 void Map::RemoveLandmark(const Landmark* const lm) {
   if (lm != nullptr) {
     RemoveLandmark(lm->id_);
@@ -319,6 +371,17 @@ void Map::RemoveLandmark(const LandmarkId& lm_id) {
   }
 }
 
+void Map::ApplySimilarityToLandmarks(const double scale,
+                                     const Mat3d& rotation,
+                                     const Vec3d& translation) {
+  const Mat3d scaled_rotation = scale * rotation;
+  for (auto& lm : landmarks_) {
+    auto& landmark = lm.second;
+    landmark.SetGlobalPos(scaled_rotation * landmark.GetGlobalPos() +
+                          translation);
+  }
+}
+
 geometry::Camera& Map::CreateCamera(const geometry::Camera& cam) {
   auto it = cameras_.emplace(cam.id, cam);
   bias_.emplace(cam.id, geometry::Similarity());
@@ -569,6 +632,19 @@ Map::GetValidObservations(const TracksManager& tracks_manager) const {
   return observations;
 }
 
+std::unordered_map<ShotId, Observation> Map::GetValidTrackObservations(
+    const TracksManager& tracks_manager, const TrackId& track_id) const {
+  std::unordered_map<ShotId, Observation> observations;
+  for (const auto& shot_n_obs :
+       tracks_manager.GetTrackObservations(track_id)) {
+    if (shots_.find(shot_n_obs.first) == shots_.end()) {
+      continue;
+    }
+    observations.emplace(shot_n_obs);
+  }
+  return observations;
+}
+
 TracksManager Map::ToTracksManager() const {
   TracksManager manager;
   for (const auto& shot_pair : shots_) {
@@ -189,6 +189,25 @@ void TracksManager::AddObservation(const ShotId& shot_id,
   shots_per_track_[track_id][shot_id] = observation;
 }
 
+void TracksManager::AddShotObservations(const ShotId& shot_id,
+                                        const std::vector<TrackId>& track_ids,
+                                        const MatX3d& xys_scales,
+                                        const MatX3i& colors,
+                                        const VecXi& feature_ids) {
+  const auto count = static_cast<Eigen::Index>(track_ids.size());
+  if (xys_scales.rows() != count || colors.rows() != count ||
+      feature_ids.size() != count) {
+    throw std::runtime_error(
+        "Track ids, points, colors and feature ids have different sizes.");
+  }
+  for (Eigen::Index i = 0; i < count; ++i) {
+    const Observation observation(xys_scales(i, 0), xys_scales(i, 1),
+                                  xys_scales(i, 2), colors(i, 0), colors(i, 1),
+                                  colors(i, 2), feature_ids[i]);
+    AddObservation(shot_id, track_ids[i], observation);
+  }
+}
+
 void TracksManager::RemoveObservation(const ShotId& shot_id,
                                       const TrackId& track_id) {
   const auto find_shot = tracks_per_shot_.find(shot_id);
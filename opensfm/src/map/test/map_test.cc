@@ -57,6 +57,38 @@ TEST_F(EmptyMapFixture, CreateAndReturnLandmarkCorrectly) {
   ASSERT_EQ(&map.GetLandmark(id), &lm);
 }
 
+TEST_F(EmptyMapFixture, CreateLandmarksCorrectly) {
+  const std::vector<map::LandmarkId> ids = {"0", "1"};
+  MatX3d positions = MatX3d::Random(2, 3);
+  MatX3i colors(2, 3);
+  colors << 255, 0, 0, 0, 255, 0;
+  map.CreateLandmarks(ids, positions, colors);
+  ASSERT_EQ(2, map.NumberOfLandmarks());
+  for (int i = 0; i < 2; ++i) {
+    const auto& lm = map.GetLandmark(ids[i]);
+    ASSERT_EQ(positions.row(i).transpose(), lm.GetGlobalPos());
+    ASSERT_EQ(colors.row(i).transpose(), lm.GetColor());
+  }
+}
+
+TEST_F(EmptyMapFixture, CreateLandmarksWithDefaultColor) {
+  const std::vector<map::LandmarkId> ids = {"0", "1"};
+  MatX3d positions = MatX3d::Random(2, 3);
+  map.CreateLandmarks(ids, positions);
+  ASSERT_EQ(2, map.NumberOfLandmarks());
+  for (int i = 0; i < 2; ++i) {
+    const auto& lm = map.GetLandmark(ids[i]);
+    ASSERT_EQ(positions.row(i).transpose(), lm.GetGlobalPos());
+    ASSERT_EQ(Vec3i(255, 0, 0), lm.GetColor());
+  }
+}
+
+TEST_F(EmptyMapFixture, ThrowOnCreateLandmarksSizeMismatch) {
+  const std::vector<map::LandmarkId> ids = {"0", "1"};
+  EXPECT_ANY_THROW(
+      map.CreateLandmarks(ids, MatX3d::Random(1, 3), MatX3i::Zero(2, 3)));
+}
+
 TEST_F(EmptyMapFixture, HasLandmarkAfterCreation) {
   const std::string id = "0";
   map.CreateLandmark(id, Vec3d::Random());
@@ -87,6 +119,18 @@ TEST_F(EmptyMapFixture, CreatePointWithCorrectCoords) {
   ASSERT_EQ(position, point.GetGlobalPos());
 }
 
+TEST_F(EmptyMapFixture, ApplySimilarityToLandmarks) {
+  const Vec3d position = Vec3d::Random();
+  auto& point = map.CreateLandmark(std::to_string(0), position);
+  const double scale = 2.0;
+  Mat3d rotation;
+  rotation << 0, -1, 0, 1, 0, 0, 0, 0, 1;
+  const Vec3d translation = Vec3d::Random();
+  map.ApplySimilarityToLandmarks(scale, rotation, translation);
+  ASSERT_TRUE(point.GetGlobalPos().isApprox(
+      scale * rotation * position + translation));
+}
+
 TEST_F(EmptyMapFixture, ReturnsHasLandmark) {
   const int id = 0;
   map.CreateLandmark(std::to_string(id), Vec3d::Random());
@@ -163,6 +207,55 @@ TEST_F(ToyMapFixture, ThrowsWhenRemovingLandmarkTwice) {
   ASSERT_THROW(map.RemoveLandmark("1"), std::runtime_error);
 }
 
+TEST_F(ToyMapFixture, AddsShotObservations) {
+  const std::vector<map::LandmarkId> lm_ids = {"2", "5"};
+  MatX3d xys_scales(2, 3);
+  xys_scales << 100, 200, 0.5, 300, 400, 1.0;
+  MatX3i colors(2, 3);
+  colors << 255, 0, 0, 0, 255, 0;
+  VecXi feature_ids(2);
+  feature_ids << 4, 1;
+  map.AddShotObservations("0", lm_ids, xys_scales, colors, feature_ids);
+
+  auto& shot = map.GetShot("0");
+  ASSERT_EQ(2, shot.ComputeValidLandmarks().size());
+  for (int i = 0; i < 2; ++i) {
+    auto& lm = map.GetLandmark(lm_ids[i]);
+    ASSERT_EQ(1, lm.NumberOfObservations());
+    const auto obs = shot.GetLandmarkObservation(&lm);
+    ASSERT_EQ(xys_scales.row(i).head<2>().transpose(), obs->point);
+    ASSERT_EQ(xys_scales(i, 2), obs->scale);
+    ASSERT_EQ(colors.row(i).transpose(), obs->color);
+    ASSERT_EQ(feature_ids[i], obs->feature_id);
+  }
+}
+
+TEST_F(ToyMapFixture, AddsShotObservationsToObservedShot) {
+  auto& shot = map.GetShot("0");
+  auto& observed = map.GetLandmark("0");
+  map.AddObservation(&shot, &observed,
+                     map::Observation(10, 20, 1.0, 255, 255, 255, 0));
+
+  VecXi feature_ids(2);
+  feature_ids << 1, 2;
+  map.AddShotObservations("0", {"1", "2"}, MatX3d::Ones(2, 3),
+                          MatX3i::Zero(2, 3), feature_ids);
+
+  ASSERT_EQ(3, shot.ComputeValidLandmarks().size());
+  ASSERT_EQ(&observed, shot.GetObservationLandmark(0));
+  ASSERT_EQ(&map.GetLandmark("1"), shot.GetObservationLandmark(1));
+  ASSERT_EQ(&map.GetLandmark("2"), shot.GetObservationLandmark(2));
+
+  map.RemoveObservation("0", "1");
+  ASSERT_EQ(nullptr, shot.GetObservationLandmark(1));
+  ASSERT_EQ(&observed, shot.GetObservationLandmark(0));
+}
+
+TEST_F(ToyMapFixture, ThrowOnAddShotObservationsSizeMismatch) {
+  EXPECT_ANY_THROW(map.AddShotObservations("0", {"1", "2"}, MatX3d::Ones(2, 3),
+                                           MatX3i::Zero(2, 3), VecXi::Zero(1)));
+}
+
 TEST_F(ToyMapFixture, ReturnNumberOfRigInstanceCorrectly) {
   ASSERT_EQ(map.NumberOfRigInstances(), 8);
 }
@@ -275,6 +368,19 @@ TEST_F(OneCameraMapFixture, ComputeReprojectionErrorNormalized) {
   ASSERT_NEAR(expected[1] / scale, computed[1], 1e-8);
 }
 
+TEST_F(OneCameraMapFixture, GetValidTrackObservations) {
+  map.CreateShot("0", "0", "0", "0", geometry::Pose());
+
+  auto manager = map::TracksManager();
+  const map::Observation o(0., 0., 1., 1, 1, 1, 1, 1, 1);
+  manager.AddObservation("0", "1", o);
+  manager.AddObservation("2", "1", o);
+
+  const auto observations = map.GetValidTrackObservations(manager, "1");
+  ASSERT_EQ(observations.size(), 1);
+  ASSERT_EQ(observations.at("0"), o);
+}
+
 class OneRigMapFixture : public EmptyMapFixture {
  public:
   OneRigMapFixture() {
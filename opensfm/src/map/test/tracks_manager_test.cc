@@ -49,6 +49,11 @@ TEST_F(TracksManagerTest, ReturnsTracksIDs) {
               ::testing::WhenSorted(::testing::ElementsAre("1")));
 }
 
+TEST_F(TracksManagerTest, HasShotObservations) {
+  EXPECT_TRUE(manager.HasShotObservations("1"));
+  EXPECT_FALSE(manager.HasShotObservations("4"));
+}
+
 TEST_F(TracksManagerTest, ReturnsObservation) {
   EXPECT_EQ(manager.GetObservation("1", "1"),
             map::Observation(1.0, 1.0, 1.0, 1, 1, 1, 1, 1, 1));
@@ -60,6 +65,25 @@ TEST_F(TracksManagerTest, AddsObservation) {
   EXPECT_EQ(manager.GetObservation("4", "1"), obs);
 }
 
+TEST_F(TracksManagerTest, AddsShotObservations) {
+  MatX3d points(2, 3);
+  points << 4.0, 4.0, 4.0, 5.0, 5.0, 5.0;
+  MatX3i colors(2, 3);
+  colors << 4, 4, 4, 5, 5, 5;
+  VecXi feature_ids(2);
+  feature_ids << 7, 3;
+  manager.AddShotObservations("4", {"1", "2"}, points, colors, feature_ids);
+  EXPECT_EQ(manager.GetObservation("4", "1"),
+            map::Observation(4.0, 4.0, 4.0, 4, 4, 4, 7));
+  EXPECT_EQ(manager.GetObservation("4", "2"),
+            map::Observation(5.0, 5.0, 5.0, 5, 5, 5, 3));
+}
+
+TEST_F(TracksManagerTest, ThrowOnAddShotObservationsSizeMismatch) {
+  EXPECT_ANY_THROW(manager.AddShotObservations(
+      "4", {"1", "2"}, MatX3d::Zero(2, 3), MatX3i::Zero(2, 3), VecXi::Zero(1)));
+}
+
 TEST_F(TracksManagerTest, RemoveObservation) {
   manager.RemoveObservation("3", "1");
   auto copy = track;
@@ -13,6 +13,10 @@ class TracksManager {
  public:
   void AddObservation(const ShotId& shot_id, const TrackId& track_id,
                       const Observation& observation);
+  void AddShotObservations(const ShotId& shot_id,
+                           const std::vector<TrackId>& track_ids,
+                           const MatX3d& xys_scales, const MatX3i& colors,
+                           const VecXi& feature_ids);
   void RemoveObservation(const ShotId& shot_id, const TrackId& track_id);
   Observation GetObservation(const ShotId& shot, const TrackId& track) const;
 
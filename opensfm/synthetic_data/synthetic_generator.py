@@ -5,7 +5,6 @@ import time
 from collections import defaultdict
 from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
-import cv2
 import numpy as np
 import opensfm.synthetic_data.synthetic_dataset as sd
 import scipy.signal as signal
@@ -16,7 +15,6 @@ from opensfm import (
     geometry,
     pygeometry,
     pymap,
-    reconstruction as rc,
     types,
 )
 from opensfm.types import Reconstruction
@@ -28,7 +26,7 @@ logger: logging.Logger = logging.getLogger(__name__)
 def derivative(func: Callable, x: np.ndarray) -> np.ndarray:
     eps = 1e-10
     d = (func(x + eps) - func(x)) / eps
-    d /= np.linalg.norm(d)
+    d /= np.linalg.norm(d, axis=-1, keepdims=True)
     return d
 
 
@@ -49,53 +47,41 @@ def samples_generator_interval(
 def generate_samples_and_local_frame(
     samples: np.ndarray, shape: Callable
 ) -> Tuple[np.ndarray, np.ndarray]:
-    points = []
-    tangents = []
-    for i in samples:
-        point = shape(i)
-        points += [point]
-        ex = derivative(shape, i)
-        ez = np.array([ex[1], -ex[0]])
-        tangents += [np.array([ez, ex])]
-    return np.array(points), np.array(tangents)
+    points = shape(samples)
+    ex = derivative(shape, samples)
+    ez = np.stack([ex[:, 1], -ex[:, 0]], axis=1)
+    return points, np.stack([ez, ex], axis=1)
 
 
 def generate_samples_shifted(
     samples: np.ndarray, shape: Callable, shift: float
 ) -> np.ndarray:
-    plane_points = []
-    for i in samples:
-        point = shape(i)
-        tangent = derivative(shape, i)
-        tangent = np.array([-tangent[1], tangent[0]])
-        point += tangent * (shift / 2)
-        plane_points += [point]
-    return np.array(plane_points)
+    tangents = derivative(shape, samples)
+    normals = np.stack([-tangents[:, 1], tangents[:, 0]], axis=1)
+    return shape(samples) + normals * (shift / 2)
 
 
 def generate_z_plane(
     samples: np.ndarray, shape: Callable, thickness: float
 ) -> np.ndarray:
-    plane_points = []
-    for i in samples:
-        point = shape(i)
-        tangent = derivative(shape, i)
-        tangent = np.array([-tangent[1], tangent[0]])
-        shift = tangent * ((np.random.rand() - 0.5) * thickness)
-        point += shift
-        plane_points += [point]
-    plane_points = np.array(plane_points)
-    return np.insert(plane_points, 2, values=0, axis=1)
+    tangents = derivative(shape, samples)
+    normals = np.stack([-tangents[:, 1], tangents[:, 0]], axis=1)
+    shifts = (np.random.rand(len(samples)) - 0.5) * thickness
+    plane_points = np.zeros((len(samples), 3))
+    plane_points[:, :2] = shape(samples) + normals * shifts[:, np.newaxis]
+    return plane_points
 
 
 def generate_xy_planes(
     samples: np.ndarray, shape: Callable, z_size: float, y_size: float
 ) -> np.ndarray:
-    xy1 = generate_samples_shifted(samples, shape, y_size)
-    xy2 = generate_samples_shifted(samples, shape, -y_size)
-    xy1 = np.insert(xy1, 2, values=np.random.rand(xy1.shape[0]) * z_size, axis=1)
-    xy2 = np.insert(xy2, 2, values=np.random.rand(xy2.shape[0]) * z_size, axis=1)
-    return np.concatenate((xy1, xy2), axis=0)
+    n = len(samples)
+    planes = np.empty((2 * n, 3))
+    planes[:n, :2] = generate_samples_shifted(samples, shape, y_size)
+    planes[n:, :2] = generate_samples_shifted(samples, shape, -y_size)
+    planes[:n, 2] = np.random.rand(n) * z_size
+    planes[n:, 2] = np.random.rand(n) * z_size
+    return planes
 
 
 def generate_street(
@@ -109,53 +95,52 @@ def generate_street(
 def generate_cameras(
     samples: np.ndarray, shape: Callable, height: float
 ) -> Tuple[np.ndarray, np.ndarray]:
-    positions, rotations = generate_samples_and_local_frame(samples, shape)
-    positions = np.insert(positions, 2, values=height, axis=1)
-    rotations = np.insert(rotations, 2, values=0, axis=2)
-    rotations = np.insert(rotations, 1, values=np.array([0, 0, -1]), axis=1)
+    positions_2d, frames_2d = generate_samples_and_local_frame(samples, shape)
+    positions = np.empty((len(samples), 3))
+    positions[:, :2] = positions_2d
+    positions[:, 2] = height
+    rotations = np.zeros((len(samples), 3, 3))
+    rotations[:, 0, :2] = frames_2d[:, 0]
+    rotations[:, 1, 2] = -1
+    rotations[:, 2, :2] = frames_2d[:, 1]
     return positions, rotations
 
 
 def line_generator(
     length: float, center_x: float, center_y: float, transpose: bool, point: np.ndarray
 ) -> np.ndarray:
-    x = point * length
+    x = point * length + center_x
+    y = np.full_like(x, center_y)
     if transpose:
-        return np.transpose(
-            np.array(
-                [
-                    center_y,
-                    x + center_x,
-                ]
-            )
-        )
+        return np.stack([y, x], axis=-1)
     else:
-        return np.transpose(np.array([x + center_x, center_y]))
+        return np.stack([x, y], axis=-1)
 
 
-def ellipse_generator(x_size: float, y_size: float, point: float) -> np.ndarray:
+def ellipse_generator(
+    x_size: float, y_size: float, point: Union[float, np.ndarray]
+) -> np.ndarray:
     y = np.sin(point * 2 * np.pi) * y_size / 2
     x = np.cos(point * 2 * np.pi) * x_size / 2
-    return np.transpose(np.array([x, y]))
+    return np.stack([x, y], axis=-1)
 
 
 def perturb_points(points: np.ndarray, sigmas: List[float]) -> None:
     eps = 1e-10
-    gaussian = np.array([max(s, eps) for s in sigmas])
-    for point in points:
-        point += np.random.normal(0.0, gaussian, point.shape)
+    gaussian = np.maximum(sigmas, eps)
+    points += np.random.normal(0.0, gaussian, points.shape)
 
 
 def generate_causal_noise(
     dimensions: int, sigma: float, n: int, scale: float
 ) -> List[np.ndarray]:
-    dims = [np.arange(-scale, scale) for _ in range(dimensions)]
-    mesh = np.meshgrid(*dims)
-    dist = np.linalg.norm(mesh, axis=0)
-    filter_kernel = np.exp(-(dist**2) / (2 * scale))
+    # The gaussian kernel is separable: filter each axis of the noise in turn
+    offsets = np.arange(-scale, scale)
+    filter_kernel = np.exp(-(offsets**2) / (2 * scale))
 
     noise = np.random.randn(dimensions, n) * sigma
-    return signal.fftconvolve(noise, filter_kernel, mode="same")
+    noise = signal.fftconvolve(noise, filter_kernel[:, np.newaxis], mode="same")
+    return signal.fftconvolve(noise, filter_kernel[np.newaxis, :], mode="same")
 
 
 def generate_exifs(
@@ -207,66 +192,71 @@ def generate_exifs(
             exifs[shot_id]["capture_time"] = previous_time
 
     for sequence_images in per_sequence.values():
+        shots = [reconstruction.shots[shot_name] for shot_name in sequence_images]
         if causal_gps_noise:
-            sequence_gps_dop = _gps_dop(reconstruction.shots[sequence_images[0]])
+            sequence_gps_dop = _gps_dop(shots[0])
             perturbations_2d = generate_causal_noise(
                 2, sequence_gps_dop, len(sequence_images), 2.0
             )
-        for i, shot_name in enumerate(sequence_images):
-            shot = reconstruction.shots[shot_name]
-            exif = exifs[shot_name]
+            gps_perturbations = np.column_stack(
+                (perturbations_2d.T, np.zeros(len(shots)))
+            )
+        else:
+            gps_dops = [_gps_dop(shot) for shot in shots]
+            gps_perturbations = np.column_stack(
+                (gps_dops, gps_dops, np.zeros(len(shots)))
+            )
 
-            origin = shot.pose.get_origin()
+        # Draw the GPS and then the IMU noise of each shot, in the same order
+        # as perturbing them one shot at a time
+        noise = np.random.standard_normal((len(shots), 6))
+        origins = np.array([shot.pose.get_origin() for shot in shots])
+        origins += np.maximum(gps_perturbations, 1e-10) * noise[:, :3]
+        opk_noises = imu_noise * noise[:, 3:]
+        lats, lons, alts = reference.to_lla(origins[:, 0], origins[:, 1], origins[:, 2])
 
-            if causal_gps_noise:
-                gps_perturbation = [perturbations_2d[j][i] for j in range(2)] + [0]
-            else:
-                gps_noise = _gps_dop(shot)
-                gps_perturbation = [gps_noise, gps_noise, 0]
+        rotations = np.array([shot.pose.get_rotation_matrix() for shot in shots])
+        compasses = np.rad2deg(np.arctan2(rotations[:, 2, 0], rotations[:, 2, 1]))
+        compasses = (compasses + 360) % 360
 
-            origin = np.array([origin])
-            perturb_points(origin, gps_perturbation)
-            origin = origin[0]
-            _, _, _, comp = rc.shot_lla_and_compass(shot, reference)
-            lat, lon, alt = reference.to_lla(*origin)
+        for i, (shot_name, shot) in enumerate(zip(sequence_images, shots)):
+            exif = exifs[shot_name]
 
             exif["gps"] = {}
-            exif["gps"]["latitude"] = lat
-            exif["gps"]["longitude"] = lon
-            exif["gps"]["altitude"] = alt
+            exif["gps"]["latitude"] = lats[i]
+            exif["gps"]["longitude"] = lons[i]
+            exif["gps"]["altitude"] = alts[i]
             exif["gps"]["dop"] = _gps_dop(shot)
 
-            omega, phi, kappa = geometry.opk_from_rotation(
-                shot.pose.get_rotation_matrix()
-            )
-            opk_noise = np.random.normal(0.0, np.full((3), imu_noise), (3))
+            omega, phi, kappa = geometry.opk_from_rotation(rotations[i])
+            opk_noise = opk_noises[i]
             exif["opk"] = {}
             exif["opk"]["omega"] = math.degrees(omega) + opk_noise[0]
             exif["opk"]["phi"] = math.degrees(phi) + opk_noise[1]
             exif["opk"]["kappa"] = math.degrees(kappa) + opk_noise[2]
 
-            exif["compass"] = {"angle": comp}
+            exif["compass"] = {"angle": compasses[i]}
 
     return exifs
 
 
 def perturb_rotations(rotations: np.ndarray, angle_sigma: float) -> None:
-    for i in range(len(rotations)):
-        rotation = rotations[i]
-        rodrigues = cv2.Rodrigues(rotation)[0].ravel()
-        angle = np.linalg.norm(rodrigues)
-        angle_pertubed = angle + np.random.normal(0.0, angle_sigma)
-        rodrigues *= float(angle_pertubed) / float(angle)
-        rotations[i] = cv2.Rodrigues(rodrigues)[0]
+    rodrigues = spatial.transform.Rotation.from_matrix(rotations).as_rotvec()
+    angles = np.linalg.norm(rodrigues, axis=1)
+    angles_perturbed = angles + np.random.normal(0.0, angle_sigma, len(angles))
+    rodrigues *= (angles_perturbed / angles)[:, np.newaxis]
+    rotations[:] = spatial.transform.Rotation.from_rotvec(rodrigues).as_matrix()
 
 
 def add_points_to_reconstruction(
     points: np.ndarray, color: np.ndarray, reconstruction: types.Reconstruction
 ) -> None:
     shift = len(reconstruction.points)
-    for i in range(points.shape[0]):
-        point = reconstruction.create_point(str(shift + i), points[i, :])
-        point.color = color
+    reconstruction.map.create_landmarks(
+        [str(shift + i) for i in range(len(points))],
+        points,
+        np.tile(color, (len(points), 1)),
+    )
 
 
 def add_shots_to_reconstruction(
@@ -367,18 +357,16 @@ def generate_track_data(
     desc_size = 128
     non_zeroes = 5
 
-    points_ids = list(reconstruction.points)
-    points_coordinates = [p.coordinates for p in reconstruction.points.values()]
-    points_colors = [p.color for p in reconstruction.points.values()]
+    points_ids = np.array(list(reconstruction.points), dtype=str)
+    landmarks = list(reconstruction.points.values())
+    points_coordinates = np.array([p.coordinates for p in landmarks]).reshape(-1, 3)
+    points_colors = np.array([p.color for p in landmarks]).reshape(-1, 3)
 
     # generate random descriptors per point
-    track_descriptors = []
-    for _ in points_coordinates:
-        descriptor = np.zeros(desc_size)
-        for _ in range(non_zeroes):
-            index = np.random.randint(0, desc_size)
-            descriptor[index] = np.random.random() * 255
-        track_descriptors.append(descriptor.round().astype(feature_data_type))
+    track_descriptors = np.zeros((len(points_ids), desc_size), dtype=feature_data_type)
+    indices = np.random.randint(0, desc_size, (len(points_ids), non_zeroes))
+    values = np.round(np.random.random((len(points_ids), non_zeroes)) * 255)
+    track_descriptors[np.arange(len(points_ids))[:, np.newaxis], indices] = values
 
     # should speed-up projection queries
     points_tree = spatial.cKDTree(points_coordinates)
@@ -386,64 +374,61 @@ def generate_track_data(
     start = time.time()
     features = sd.SyntheticFeatures(on_disk_features_filename)
     default_scale = 0.004
-    for index, (shot_index, shot) in enumerate(reconstruction.shots.items()):
-        # query all closest points
-        neighbors = list(
-            sorted(points_tree.query_ball_point(shot.pose.get_origin(), maximum_depth))
-        )
-
-        # project them
-        projections = shot.project_many(
-            np.array([points_coordinates[c] for c in neighbors])
-        )
+    shots = list(reconstruction.shots.items())
+    centers = np.array([shot.pose.get_origin() for _, shot in shots]).reshape(-1, 3)
+    query_batch_size = 100
+    for index, (shot_index, shot) in enumerate(shots):
+        # query all closest points, for a batch of shots at once
+        if index % query_batch_size == 0:
+            batch_neighbors = points_tree.query_ball_point(
+                centers[index : index + query_batch_size],
+                maximum_depth,
+                workers=-1,
+                return_sorted=True,
+            )
+        neighbors = np.array(batch_neighbors[index % query_batch_size], dtype=int)
 
         # shot constants
-        center = shot.pose.get_origin()
+        center = centers[index]
         z_axis = shot.pose.get_rotation_matrix()[2]
-        is_panorama = pygeometry.Camera.is_panorama(shot.camera.projection_type)
-        perturbation = float(projection_noise) / float(
-            max(shot.camera.width, shot.camera.height)
-        )
+        camera = shot.camera
+        width, height = camera.width, camera.height
+        is_panorama = pygeometry.Camera.is_panorama(camera.projection_type)
+
+        # project them
+        points = points_coordinates[neighbors]
+        projections = shot.project_many(points)
+
+        perturbation = float(projection_noise) / float(max(width, height))
         sigmas = np.array([perturbation, perturbation])
 
         # pre-generate random perturbations
         perturbations = np.random.normal(0.0, sigmas, (len(projections), 2))
 
-        # run and check valid projections
-        projections_inside = []
-        descriptors_inside = []
-        colors_inside = []
-        for i, (p_id, projection) in enumerate(zip(neighbors, projections)):
-            if not _is_inside_camera(projection, shot.camera):
-                continue
-
-            point = points_coordinates[p_id]
-            if not is_panorama and not _is_in_front(point, center, z_axis):
-                continue
-
-            # add perturbation
-            projection += perturbations[i]
-
-            # push data
-            color = points_colors[p_id]
-            original_id = points_ids[p_id]
-            projections_inside.append([projection[0], projection[1], default_scale])
-            descriptors_inside.append(track_descriptors[p_id])
-            colors_inside.append(color)
-            obs = pymap.Observation(
-                projection[0],
-                projection[1],
-                default_scale,
-                color[0],
-                color[1],
-                color[2],
-                len(projections_inside) - 1,
-            )
-            tracks_manager.add_observation(str(shot_index), str(original_id), obs)
+        # check valid projections and add perturbation
+        valid = _is_inside_camera(projections, width, height)
+        if not is_panorama:
+            valid &= _is_in_front(points, center, z_axis)
+        valid = np.flatnonzero(valid)
+        projections = projections[valid] + perturbations[valid]
+        valid_ids = neighbors[valid]
+
+        # push data
+        points_inside = np.column_stack(
+            (projections, np.full(len(projections), default_scale))
+        )
+        colors_inside = points_colors[valid_ids]
+        tracks_manager.add_shot_observations(
+            str(shot_index),
+            points_ids[valid_ids].tolist(),
+            points_inside,
+            colors_inside,
+            np.arange(len(valid_ids), dtype=np.int32),
+        )
         features[shot_index] = oft.FeaturesData(
-            np.array(projections_inside),
-            np.array(descriptors_inside),
-            np.array(colors_inside),
+            points_inside,
+            track_descriptors[valid_ids],
+            colors_inside,
             None,
         )
 
@@ -486,19 +471,16 @@ def generate_track_data(
     return features, tracks_manager, gcps
 
 
-def _is_in_front(point: np.ndarray, center: np.ndarray, z_axis: np.ndarray) -> bool:
-    return (
-        (point[0] - center[0]) * z_axis[0]
-        + (point[1] - center[1]) * z_axis[1]
-        + (point[2] - center[2]) * z_axis[2]
-    ) > 0
+def _is_in_front(
+    points: np.ndarray, center: np.ndarray, z_axis: np.ndarray
+) -> np.ndarray:
+    return (points - center).dot(z_axis) > 0
 
 
-def _is_inside_camera(projection: np.ndarray, camera: pygeometry.Camera) -> bool:
-    w, h = float(camera.width), float(camera.height)
-    w2 = float(2 * camera.width)
-    h2 = float(2 * camera.height)
+def _is_inside_camera(projections: np.ndarray, width: int, height: int) -> np.ndarray:
+    w, h = float(width), float(height)
     if w > h:
-        return (-0.5 < projection[0] < 0.5) and (-h / w2 < projection[1] < h / w2)
+        x, y, y_max = projections[:, 0], projections[:, 1], h / (2 * w)
     else:
-        return (-0.5 < projection[1] < 0.5) and (-w / h2 < projection[0] < w / h2)
+        x, y, y_max = projections[:, 1], projections[:, 0], w / (2 * h)
+    return (-0.5 < x) & (x < 0.5) & (-y_max < y) & (y < y_max)
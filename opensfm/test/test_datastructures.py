@@ -18,6 +18,10 @@ from opensfm.test.utils import (
 )
 
 
+# Fixed-intrinsics camera copied by tests that only need distinct ids
+_PERSPECTIVE_CAMERA = pygeometry.Camera.create_perspective(0.5, 0, 0)
+
+
 def _create_reconstruction(
     n_cameras: int=0,
     n_shots_cam=None,
@@ -50,8 +54,9 @@ def _create_reconstruction(
 
     rec = types.Reconstruction()
     if n_cameras > 0:
+        cam_params = np.random.rand(n_cameras, 3)
         for i in range(n_cameras):
-            focal, k1, k2 = np.random.rand(3)
+            focal, k1, k2 = cam_params[i]
             cam = pygeometry.Camera.create_perspective(focal, k1, k2)
             cam.id = str(i)
             rec.add_camera(cam)
@@ -69,23 +74,44 @@ def _create_reconstruction(
                 shot_id += 1
 
     if n_points > 0:
-        for i in range(n_points):
-            rec.create_point(str(i), np.random.rand(3))
+        pt_coords = np.random.rand(n_points, 3)
+        point_ids = [str(i) for i in range(n_points)]
+        rec.map.create_landmarks(point_ids, pt_coords)
 
         if dist_to_shots:
             n_shots = len(rec.shots)
-            for pt in rec.points.values():
-                choice = set(np.random.choice(n_shots, n_shots))
-                if len(choice) > 1:
-                    for ch in choice:
-                        # create a new observation
-                        obs = pymap.Observation(100, 200, 0.5, 255, 0, 0, int(pt.id))
-                        shot = rec.shots[str(ch)]
-                        rec.add_observation(shot, pt, obs)
+            choices = np.random.randint(0, n_shots, (n_points, n_shots))
+            observed = np.zeros((n_points, n_shots), dtype=bool)
+            observed[np.arange(n_points)[:, None], choices] = True
+            observed[observed.sum(axis=1) < 2] = False
+
+            ids_per_point = np.array(point_ids)
+            for shot_index in range(n_shots):
+                # the point index is used as feature id
+                indices = np.flatnonzero(observed[:, shot_index]).astype(np.int32)
+                rec.map.add_shot_observations(
+                    str(shot_index),
+                    ids_per_point[indices].tolist(),
+                    np.tile([100.0, 200.0, 0.5], (len(indices), 1)),
+                    np.tile(np.array([255, 0, 0], dtype=np.int32), (len(indices), 1)),
+                    indices,
+                )
         # TODO: If required, we have to do the same for pano shots
     return rec
 
 
+@pytest.fixture(scope="module")
+def rec_1cam() -> types.Reconstruction:
+    """Prototype reconstruction with one camera, deep-copied by tests"""
+    return _create_reconstruction(1)
+
+
+@pytest.fixture(scope="module")
+def rec_2cam() -> types.Reconstruction:
+    """Prototype reconstruction with two cameras, deep-copied by tests"""
+    return _create_reconstruction(2)
+
+
 """
 Camera Tests
 """
@@ -95,8 +121,9 @@ def test_create_cameras() -> None:
     n_cameras = 100
     rec = types.Reconstruction()
 
+    cam_params = np.random.rand(n_cameras, 3)
     for cam_id in range(0, n_cameras):
-        focal, k1, k2 = np.random.rand(3)
+        focal, k1, k2 = cam_params[cam_id]
         cam = pygeometry.Camera.create_perspective(focal, k1, k2)
         cam.id = str(cam_id)
         # create the camera within the reconstruction
@@ -357,14 +384,15 @@ def test_shot_measurement_setter_and_getter() -> None:
 
 
 def _helper_populate_metadata(m) -> None:
-    m.capture_time.value = np.random.rand(1)
-    m.gps_position.value = np.random.rand(3)
-    m.gps_accuracy.value = np.random.rand(1)
-    m.compass_accuracy.value = np.random.rand(1)
-    m.compass_angle.value = np.random.rand(1)
-    m.opk_accuracy.value = np.random.rand(1)
-    m.opk_angles.value = np.random.rand(3)
-    m.gravity_down.value = np.random.rand(3)
+    values = np.random.rand(14)
+    m.capture_time.value = values[0:1]
+    m.gps_position.value = values[1:4]
+    m.gps_accuracy.value = values[4:5]
+    m.compass_accuracy.value = values[5:6]
+    m.compass_angle.value = values[6:7]
+    m.opk_accuracy.value = values[7:8]
+    m.opk_angles.value = values[8:11]
+    m.gravity_down.value = values[11:14]
     m.orientation.value = random.randint(0, 100)
     m.sequence_key.value = "sequence_key"
 
@@ -383,9 +411,9 @@ def test_shot_measurement_set() -> None:
     assert_metadata_equal(m1, m3)
 
 
-def test_shot_create() -> None:
+def test_shot_create(rec_2cam: types.Reconstruction) -> None:
     # Given some created shot
-    rec = _create_reconstruction(2)
+    rec = copy.deepcopy(rec_2cam)
     shot1 = rec.create_shot("shot0", "0")
 
     # When getting it, it should have some properties
@@ -394,9 +422,9 @@ def test_shot_create() -> None:
     assert len(rec.shots) == 1
 
 
-def test_shot_create_existing() -> None:
+def test_shot_create_existing(rec_2cam: types.Reconstruction) -> None:
     # Given some created shot
-    rec = _create_reconstruction(2)
+    rec = copy.deepcopy(rec_2cam)
     rec.create_shot("shot0", "0")
 
     # When re-adding the same shot, it should throw
@@ -405,9 +433,9 @@ def test_shot_create_existing() -> None:
         rec.create_shot("shot0", "1")
 
 
-def test_shot_create_more() -> None:
+def test_shot_create_more(rec_2cam: types.Reconstruction) -> None:
     # Given some created shot
-    rec = _create_reconstruction(2)
+    rec = copy.deepcopy(rec_2cam)
     rec.create_shot("shot0", "0")
 
     # When we create more new shots
@@ -419,9 +447,9 @@ def test_shot_create_more() -> None:
     assert len(rec.shots) == n_shots
 
 
-def test_shot_delete_non_existing() -> None:
+def test_shot_delete_non_existing(rec_2cam: types.Reconstruction) -> None:
     # Given some created reconstruction
-    rec = _create_reconstruction(2)
+    rec = copy.deepcopy(rec_2cam)
     rec.create_shot("shot0", "0")
 
     # When deleting non-existing shot
@@ -444,9 +472,9 @@ def test_shot_delete_existing() -> None:
     assert len(rec.shots) == n_shots - len(del_shots)
 
 
-def test_shot_get() -> None:
+def test_shot_get(rec_1cam: types.Reconstruction) -> None:
     # Given some created shot
-    rec = _create_reconstruction(1)
+    rec = copy.deepcopy(rec_1cam)
     shot_id = "shot0"
     shot1 = rec.create_shot(shot_id, "0")
 
@@ -455,9 +483,9 @@ def test_shot_get() -> None:
     assert shot1 is rec.shots[shot_id]
 
 
-def test_shot_pose_set() -> None:
+def test_shot_pose_set(rec_1cam: types.Reconstruction) -> None:
     # Given some created shot
-    rec = _create_reconstruction(1)
+    rec = copy.deepcopy(rec_1cam)
     shot_id = "shot0"
     shot = rec.create_shot(shot_id, "0")
 
@@ -466,9 +494,9 @@ def test_shot_pose_set() -> None:
     assert np.allclose(origin, shot.pose.get_origin())
 
 
-def test_shot_get_non_existing() -> None:
+def test_shot_get_non_existing(rec_1cam: types.Reconstruction) -> None:
     # Given some created shot
-    rec = _create_reconstruction(1)
+    rec = copy.deepcopy(rec_1cam)
     shot_id = "shot0"
     shot1 = rec.create_shot(shot_id, "0")
 
@@ -479,9 +507,9 @@ def test_shot_get_non_existing() -> None:
         assert shot1 is rec.shots["toto"]
 
 
-def test_pano_shot_get() -> None:
+def test_pano_shot_get(rec_1cam: types.Reconstruction) -> None:
     # Given some created pano shot
-    rec = _create_reconstruction(1)
+    rec = copy.deepcopy(rec_1cam)
     shot_id = "shot0"
     shot1 = rec.create_pano_shot(shot_id, "0")
 
@@ -490,9 +518,9 @@ def test_pano_shot_get() -> None:
     assert shot1 is rec.get_pano_shot(shot_id)
 
 
-def test_pano_shot_get_non_existing() -> None:
+def test_pano_shot_get_non_existing(rec_1cam: types.Reconstruction) -> None:
     # Given some created pano shot
-    rec = _create_reconstruction(1)
+    rec = copy.deepcopy(rec_1cam)
     shot_id = "shot0"
     shot1 = rec.create_shot(shot_id, "0")
 
@@ -503,9 +531,9 @@ def test_pano_shot_get_non_existing() -> None:
         assert shot1 is rec.shots["toto"]
 
 
-def test_pano_shot_create() -> None:
+def test_pano_shot_create(rec_2cam: types.Reconstruction) -> None:
     # Given some created shot
-    rec = _create_reconstruction(2)
+    rec = copy.deepcopy(rec_2cam)
     shot1 = rec.create_pano_shot("shot0", "0")
 
     # When getting it, it should have some properties
@@ -514,9 +542,9 @@ def test_pano_shot_create() -> None:
     assert len(rec.pano_shots) == 1
 
 
-def test_pano_shot_create_existing() -> None:
+def test_pano_shot_create_existing(rec_2cam: types.Reconstruction) -> None:
     # Given some created pano shot
-    rec = _create_reconstruction(2)
+    rec = copy.deepcopy(rec_2cam)
     rec.create_pano_shot("shot0", "0")
 
     n_shots = 10
@@ -528,9 +556,9 @@ def test_pano_shot_create_existing() -> None:
             rec.create_pano_shot("shot0", "1")
 
 
-def test_pano_shot_create_more() -> None:
+def test_pano_shot_create_more(rec_2cam: types.Reconstruction) -> None:
     # Given some created pano shot
-    rec = _create_reconstruction(2)
+    rec = copy.deepcopy(rec_2cam)
     rec.create_pano_shot("shot0", "0")
 
     # When we create more new pano shots
@@ -542,9 +570,9 @@ def test_pano_shot_create_more() -> None:
     assert len(rec.pano_shots) == n_shots
 
 
-def test_pano_shot_delete_non_existing() -> None:
+def test_pano_shot_delete_non_existing(rec_2cam: types.Reconstruction) -> None:
     # Given some created reconstruction
-    rec = _create_reconstruction(2)
+    rec = copy.deepcopy(rec_2cam)
     rec.create_pano_shot("shot0", "0")
 
     # When deleting non-existing shot
@@ -556,7 +584,6 @@ def test_pano_shot_delete_non_existing() -> None:
 def test_pano_shot_delete_existing() -> None:
     # Given some created reconstruction
     n_shots = 10
-    rec = _create_reconstruction(2)
     rec = _create_reconstruction(1, n_pano_shots_cam={"0": n_shots})
 
     # When deleting existing pano shot
@@ -720,7 +747,7 @@ def test_rig_shot_set_pose() -> None:
         shot.pose = pygeometry.Pose()
 
 
-def test_add_shot_from_shot_correct_value() -> None:
+def test_add_shot_from_shot_correct_value(rec_1cam: types.Reconstruction) -> None:
     # Given some created reconstruction (rec) ...
     n_shots = 5
     rec = _create_reconstruction(1, n_shots_cam={"0": n_shots})
@@ -728,7 +755,7 @@ def test_add_shot_from_shot_correct_value() -> None:
     _helper_populate_metadata(shot1.metadata)
 
     # .. and given another one (new)
-    rec_new = _create_reconstruction(1)
+    rec_new = copy.deepcopy(rec_1cam)
 
     # When adding 2 shot of rec to new
     rec_new.add_shot(rec.shots["0"])
@@ -770,7 +797,7 @@ def test_shot_metadata_assign_equal() -> None:
     assert_metadata_equal(shot1.metadata, shot2.metadata)
 
 
-def test_add_pano_shot_from_shot_correct_value() -> None:
+def test_add_pano_shot_from_shot_correct_value(rec_1cam: types.Reconstruction) -> None:
     # Given some created reconstruction (rec) ...
     n_shots = 5
     rec = _create_reconstruction(1, n_pano_shots_cam={"0": n_shots})
@@ -778,7 +805,7 @@ def test_add_pano_shot_from_shot_correct_value() -> None:
     _helper_populate_metadata(shot1.metadata)
 
     # .. and given another one (new)
-    rec_new = _create_reconstruction(1)
+    rec_new = copy.deepcopy(rec_1cam)
 
     # When adding 2 pano shot of rec to new
     rec_new.add_pano_shot(rec.pano_shots["0"])
@@ -825,7 +852,7 @@ def test_single_point_coordinates() -> None:
     pt = rec.create_point("0")
 
     # When assigning coordinates
-    coord = np.random.rand(3)
+    coord = np.array([0.1, 0.2, 0.3])
     pt.coordinates = coord
 
     # They should be set
@@ -851,7 +878,7 @@ def test_point_add_from_point() -> None:
 
     # ... and some other one (rec2) with some point
     rec2 = types.Reconstruction()
-    coord2 = np.random.rand(3)
+    coord2 = np.array([0.4, 0.5, 0.6])
     pt2 = rec2.create_point("1", coord2)
 
     # When adding rec2 point to rec
@@ -875,7 +902,9 @@ def test_point_reproj_errors_assign() -> None:
     pt = rec.points["0"]
 
     # When assigning reprojections errors
-    reproj_errors = dict({"shot1": np.random.rand(2), "shot2": np.random.rand(2)})
+    reproj_errors = dict(
+        {"shot1": np.array([0.1, 0.2]), "shot2": np.array([0.3, 0.4])}
+    )
     pt.reprojection_errors = reproj_errors
 
     # They should be correct
@@ -962,7 +991,7 @@ def test_many_observations_delete() -> None:
     n_shots = 10
     n_landmarks = 1000
     for cam_id in range(n_cams):
-        cam = pygeometry.Camera.create_perspective(0.5, 0, 0)
+        cam = copy.copy(_PERSPECTIVE_CAMERA)
         cam.id = "cam" + str(cam_id)
         m.create_camera(cam)
         m.create_rig_camera(pymap.RigCamera(pygeometry.Pose(), cam.id))
@@ -973,16 +1002,20 @@ def test_many_observations_delete() -> None:
         m.create_rig_instance(shot_id)
         m.create_shot(shot_id, cam_id, cam_id, shot_id, pygeometry.Pose())
 
-    for point_id in range(n_landmarks):
-        m.create_landmark(str(point_id), np.random.rand(3))
+    m.create_landmarks(
+        [str(point_id) for point_id in range(n_landmarks)],
+        np.random.rand(n_landmarks, 3),
+    )
 
     # ... and random connections (observations) between shots and points
     n_total_obs = 0
+    shots = list(m.get_shots().values())
     for lm in m.get_landmarks().values():
         n_obs = 0
-        for shot in m.get_shots().values():
+        lm_id = int(lm.id)
+        for shot in shots:
             # create a new observation
-            obs = pymap.Observation(100, 200, 0.5, 255, 0, 0, int(lm.id))
+            obs = pymap.Observation(100, 200, 0.5, 255, 0, 0, lm_id)
             m.add_observation(shot, lm, obs)
             n_obs += 1
             n_total_obs += 1
@@ -1002,7 +1035,7 @@ def test_clean_landmarks_with_min_observations() -> None:
     n_shots = 2
     n_landmarks = 10
     for cam_id in range(n_cams):
-        cam = pygeometry.Camera.create_perspective(0.5, 0, 0)
+        cam = copy.copy(_PERSPECTIVE_CAMERA)
         cam.id = "cam" + str(cam_id)
         m.create_camera(cam)
         m.create_rig_camera(pymap.RigCamera(pygeometry.Pose(), cam.id))
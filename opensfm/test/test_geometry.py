@@ -23,6 +23,18 @@ def test_rotation_from_ptr_compatibility() -> None:
     )
 
 
+def test_angle_axis_from_rotation() -> None:
+    for angle_axis in (
+        np.array([0.1, 0.2, 0.3]),
+        np.array([0.0, 0.0, 0.0]),
+        np.array([0.0, np.pi, 0.0]),
+        np.pi / np.sqrt(3) * np.array([-1.0, 1.0, 1.0]),
+    ):
+        rotation = geometry.rotation_from_angle_axis(angle_axis)
+        result = geometry.angle_axis_from_rotation(rotation)
+        assert np.allclose(geometry.rotation_from_angle_axis(result), rotation)
+
+
 def test_rotation_from_opk() -> None:
     ptr = 0.1, 0.2, 0.3
     rotation = geometry.rotation_from_opk(*ptr)
@@ -177,11 +177,14 @@ def all_common_tracks(
 
         tuples = tracks_manager.get_all_common_observations(im1, im2)
         if include_features:
-            common_tracks[im1, im2] = (
-                [v for v, _, _ in tuples],
-                np.array([p.point for _, p, _ in tuples]),
-                np.array([p.point for _, _, p in tuples]),
-            )
+            tracks = []
+            p1 = np.empty((len(tuples), 2))
+            p2 = np.empty((len(tuples), 2))
+            for i, (track, obs1, obs2) in enumerate(tuples):
+                tracks.append(track)
+                p1[i] = obs1.point
+                p2[i] = obs2.point
+            common_tracks[im1, im2] = (tracks, p1, p2)
         else:
             common_tracks[im1, im2] = [v for v, _, _ in tuples]
     return common_tracks